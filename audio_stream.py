@@ -0,0 +1,339 @@
+# Streaming TTS audio playback for T-Deck LLM Chat Application
+
+import array
+import struct
+import time
+import logger
+
+
+def read_exact(readinto, buf, nbytes):
+    """Fill the first nbytes of buf from readinto, returning how many bytes arrived before EOF."""
+    view = memoryview(buf)
+    filled = 0
+    while filled < nbytes:
+        n = readinto(view[filled:nbytes])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def parse_wav_header(readinto, scratch):
+    """Read RIFF/WAVE headers up to the start of the PCM data.
+
+    Returns (channels, sample_rate, bits_per_sample, data_len). data_len is None
+    when the server streams with a placeholder size and the length is unknown.
+    """
+    if read_exact(readinto, scratch, 12) < 12:
+        raise ValueError("Truncated WAV header")
+    riff, _, wave = struct.unpack_from("<4sI4s", scratch)
+    if riff != b"RIFF" or wave != b"WAVE":
+        raise ValueError("Not a WAV stream")
+    fmt = None
+    while True:
+        if read_exact(readinto, scratch, 8) < 8:
+            raise ValueError("WAV stream ended before data chunk")
+        chunk_id, chunk_len = struct.unpack_from("<4sI", scratch)
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            if chunk_len == 0 or chunk_len >= 0x7FFFFFFF:
+                chunk_len = None  # Streaming servers write a placeholder since they can't know the length up front
+            return fmt[0], fmt[1], fmt[2], chunk_len
+        if chunk_id == b"fmt ":
+            if read_exact(readinto, scratch, 16) < 16:
+                raise ValueError("Truncated WAV fmt chunk")
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", scratch)
+            if audio_format not in (1, 0xFFFE):
+                raise ValueError(f"Unsupported WAV encoding: {audio_format}")
+            fmt = (channels, sample_rate, bits)
+            chunk_len -= 16
+        # Skip the rest of this chunk (extension bytes, LIST metadata, ...)
+        chunk_len += chunk_len & 1  # Chunks are word aligned
+        while chunk_len > 0:
+            n = read_exact(readinto, scratch, min(chunk_len, len(scratch)))
+            if not n:
+                raise ValueError("WAV stream ended inside a chunk")
+            chunk_len -= n
+
+
+_mp3_available = None
+
+
+def mp3_available():
+    """True if this CircuitPython build has the audiomp3 decoder."""
+    global _mp3_available
+    if _mp3_available is None:
+        try:
+            import audiomp3
+            _mp3_available = True
+        except ImportError:
+            _mp3_available = False
+    return _mp3_available
+
+
+def choose_format(preference, throughput, pcm_rate):
+    """Pick the TTS response format: preference unless it is "auto", in which case measured throughput decides.
+
+    PCM plays as it downloads, while an MP3 clip is spooled to the card whole before
+    decoding starts, so MP3 only pays off when the link is too slow to keep up with
+    PCM. PCM is therefore used until a download has been measured (the first clip
+    after boot included) and whenever recent downloads ran at least twice as fast as
+    16-bit mono PCM plays. Slower links get MP3, roughly a tenth of the bytes, when
+    the board can decode it.
+    """
+    if preference != "auto":
+        return preference
+    if throughput is None or throughput >= 2 * pcm_rate * 2:
+        return "pcm"
+    return "mp3" if mp3_available() else "pcm"
+
+
+# CPython can view the sample ring as bytes; MicroPython's memoryview has no cast()
+_CAN_CAST = hasattr(memoryview, "cast")
+
+
+def copy_samples(samples, offset, data, nbytes):
+    """Copy nbytes of 16-bit little-endian PCM from the byte buffer data into samples, starting at sample offset."""
+    if _CAN_CAST:
+        memoryview(samples).cast("B")[offset * 2:offset * 2 + nbytes] = memoryview(data)[:nbytes]
+    else:
+        # MicroPython builds an array from a bytearray's raw bytes; slices must have matching item sizes
+        samples[offset:offset + nbytes // 2] = array.array("h", data if nbytes == len(data) else data[:nbytes])
+
+
+class WavStreamPlayer:
+    """Plays a TTS stream through the speaker while it downloads.
+
+    16-bit PCM (WAV or headerless "pcm") goes into one ring of two halves that is
+    reused for every clip, so memory use does not depend on the length of the audio.
+    The ring is a RawSample with single_buffer=False playing on a loop: the speaker
+    plays one half while the other is refilled, with no restart between blocks. The
+    speaker cannot say which half it is on, so that is worked out from the time it
+    started. Reads go through a small byte buffer because adafruit_requests sizes
+    and copies reads in items, not bytes. MP3 is spooled to spool_path and decoded
+    from there by audiomp3; a clip that is already a file (a cached one) is decoded
+    from that file. A PCM source whose readinto returns None
+    has nothing on hand yet but has not ended (a gateway turn); it is asked again on
+    the next pump.
+    """
+
+    def __init__(self, speaker, buffer_samples=2048, pcm_rate=24000, spool_path="/sd/tts_spool.mp3", spool_buf=None,
+                 staging_size=1024):
+        self.speaker = speaker
+        self.buffer_samples = buffer_samples  # Samples in each half of the ring
+        self.pcm_rate = pcm_rate  # Sample rate of headerless "pcm" responses
+        self.spool_path = spool_path
+        # array("h", bytes) means different things on CPython and CircuitPython, so build from an iterator
+        self._ring = array.array("h", (0 for _ in range(2 * buffer_samples)))
+        self._silence = array.array("h", (0 for _ in range(256)))
+        self._staging = bytearray(staging_size)
+        self._scratch = bytearray(64)
+        self._sample = None
+        self._half_seconds = 0.0
+        self._written = 0  # Halves handed to the speaker since it started
+        self._filled = 0  # Bytes in the half being written
+        self._cleared = False  # Whether the half being written has been silenced
+        self._carry = 0  # Odd byte left in the staging buffer by a read that ended mid-sample
+        self._started = None  # time.monotonic() when the speaker started on the ring
+        self._held_since = None  # When audio first waited for the speaker to start
+        self._readinto = None
+        self._remaining = None
+        self._spool = None  # File an MP3 clip is being written to
+        self._spool_buf = spool_buf  # Allocated on the first MP3 clip unless one is given
+        self._mp3_file = None  # MP3 file the decoder is playing
+        self._decoder = None
+        self.active = False
+
+    def start(self, readinto, audio_format="wav", path=None):
+        """Prepare to play a clip read from readinto: "wav", "pcm" (16-bit mono at pcm_rate) or "mp3".
+
+        path names the clip's file when it already has one; MP3 then plays from it without a spool copy.
+        """
+        self.stop()
+        if audio_format == "mp3":
+            if path is not None:
+                self._play_mp3(path)
+                return
+            self._spool = open(self.spool_path, "wb")
+            if self._spool_buf is None:
+                self._spool_buf = bytearray(1024)
+            self._readinto = readinto
+            self.active = True
+            return
+        if audio_format == "pcm":
+            channels, sample_rate, bits, data_len = 1, self.pcm_rate, 16, None
+        else:
+            channels, sample_rate, bits, data_len = parse_wav_header(readinto, self._scratch)
+        if bits != 16:
+            raise ValueError(f"Unsupported WAV sample width: {bits} bits")
+        logger.debug("Streaming %s: %dch %dHz, data length %s", audio_format, channels, sample_rate, data_len)
+        import audiocore  # First clip pays for the import, not boot
+        # RawSample keeps a reference to the ring, so refilling a half updates the sample in place
+        self._sample = audiocore.RawSample(self._ring, channel_count=channels, sample_rate=sample_rate,
+                                           single_buffer=False)
+        self._half_seconds = self.buffer_samples / channels / sample_rate
+        self._readinto = readinto
+        self._remaining = data_len
+        self._written = 0
+        self._filled = 0
+        self._cleared = False
+        self._carry = 0
+        self._started = None
+        self._held_since = None
+        self.active = True
+
+    def _silence_half(self):
+        """Zero the half being written, so a short or late block plays silence rather than old audio."""
+        start = (self._written & 1) * self.buffer_samples
+        end = start + self.buffer_samples
+        silence = self._silence
+        while start < end:
+            n = min(len(silence), end - start)
+            # A slice of an array is an array of the same type, which both CPython and CircuitPython accept
+            self._ring[start:start + n] = silence if n == len(silence) else silence[:n]
+            start += n
+        self._cleared = True
+
+    def _fill(self):
+        """Read PCM into the half being written until it is full.
+
+        Returns True if the stream has more, None if the source has nothing on hand
+        yet, and False at the end of the stream.
+        """
+        half_bytes = self.buffer_samples * 2
+        staging = self._staging
+        offset = (self._written & 1) * self.buffer_samples
+        while self._filled < half_bytes:
+            size = min(len(staging), half_bytes - self._filled) - self._carry
+            if self._remaining is not None:
+                size = min(size, self._remaining)
+                if not size:
+                    return False
+            n = self._readinto(memoryview(staging)[self._carry:self._carry + size])
+            if n is None:
+                return None
+            if not n:
+                return False
+            if self._remaining is not None:
+                self._remaining -= n
+            n += self._carry
+            self._carry = n & 1
+            n -= self._carry
+            if n:
+                copy_samples(self._ring, offset + self._filled // 2, staging, n)
+                self._filled += n
+            if self._carry:
+                staging[0] = staging[n]  # Keep the low byte of the split sample for the next read
+        return True
+
+    def _queue_half(self):
+        self._written += 1
+        self._filled = 0
+        self._cleared = False
+
+    def _underrun(self):
+        """The speaker caught up with the source: stop it, keeping any partial half for the restart."""
+        self.speaker.stop()
+        self._started = None
+        if self._written & 1:
+            # Playback always restarts at the first half, so move what was written there
+            half = self.buffer_samples
+            if self._filled:
+                memoryview(self._ring)[:half] = memoryview(self._ring)[half:]
+            else:
+                self._cleared = False
+        self._written = 0
+        logger.debug("TTS audio underrun")
+
+    def _pump_pcm(self):
+        now = time.monotonic()
+        half = self._half_seconds
+        margin = half / 4  # Allowance for the audio DMA fetching a half a little early, and pump jitter
+        if self._started is not None and now >= self._started + self._written * half:
+            if self._readinto is None:
+                self.speaker.stop()
+                self._started = None
+                self._end_clip()
+                return False
+            self._underrun()
+        # The half being written last played as half _written - 2; it is free once the speaker has moved on
+        if self._written < 2 or now >= self._started + (self._written - 1) * half + margin:
+            if not self._cleared:
+                self._silence_half()
+            if self._readinto is not None:
+                more = self._fill()
+                if more is False:
+                    self._readinto = None
+                if self._filled and self._held_since is None and self._started is None:
+                    self._held_since = now
+                if self._filled == self.buffer_samples * 2 or (self._filled and (
+                        more is False or (more is None and self._started is not None
+                                          and now >= self._started + self._written * half - margin))):
+                    # Full, or the last of the clip, or the source is late and the speaker is about to need it
+                    self._queue_half()
+        if self._started is None:
+            # Both halves go in before the speaker starts, so it begins a full half ahead of the download
+            waited = self._held_since is not None and now - self._held_since >= half
+            if self._written >= 2 or ((self._readinto is None or waited) and (self._written or self._filled)):
+                if self._filled:
+                    self._queue_half()
+                self.speaker.play(self._sample, loop=True)
+                self._started = now
+                self._held_since = None
+            elif self._readinto is None:
+                self._end_clip()  # Nothing to play
+        return self.active
+
+    def _pump_mp3(self):
+        if self._spool is not None:
+            # One chunk per call keeps the other tasks running while the clip downloads
+            n = self._readinto(self._spool_buf)
+            if n:
+                self._spool.write(memoryview(self._spool_buf)[:n])
+                return True
+            self._spool.close()
+            self._spool = None
+            self._play_mp3(self.spool_path)
+            return True
+        if self.speaker.playing:
+            return True
+        self._end_clip()
+        return False
+
+    def _play_mp3(self, path):
+        import audiomp3
+        self._readinto = None
+        self._mp3_file = open(path, "rb")
+        if self._decoder is None:
+            self._decoder = audiomp3.MP3Decoder(self._mp3_file)
+        else:
+            self._decoder.file = self._mp3_file
+        self.speaker.play(self._decoder)
+        self.active = True
+
+    def pump(self):
+        """Advance playback without blocking on the speaker. Returns True while audio is still active."""
+        if not self.active:
+            return False
+        if self._spool is not None or self._mp3_file is not None:
+            return self._pump_mp3()
+        return self._pump_pcm()
+
+    def _end_clip(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        if self._mp3_file is not None:
+            self._mp3_file.close()
+            self._mp3_file = None
+        self.active = False
+
+    def stop(self):
+        """Stop the speaker and forget any queued audio."""
+        if self.active and (self._started is not None or self._mp3_file is not None):
+            self.speaker.stop()
+        self._started = None
+        self._readinto = None
+        if self.active:
+            self._end_clip()
@@ -0,0 +1,123 @@
+# Preallocated buffers for T-Deck LLM Chat Application
+
+import json
+import logger
+
+
+class BufferPool:
+    """Fixed bytearrays reserved once at boot, each with one job.
+
+    CircuitPython's heap never moves objects, so a big buffer allocated fresh
+    every turn, at a different size each time, leaves holes that later big
+    allocations no longer fit. These are allocated while the heap is still
+    empty and then reused. take() hands a buffer to one owner for good (e.g.
+    the audio spool); borrow() lends it for one request or turn until
+    give_back(). A borrow of a buffer that is out or too small returns None,
+    and the caller falls back to allocating as before.
+    """
+
+    def __init__(self, sizes):
+        self._buffers = {name: bytearray(size) for name, size in sizes.items()}
+        self._lent = set()
+        self.misses = 0  # Borrows that fell back to allocating
+
+    def take(self, name):
+        self._lent.add(name)
+        return self._buffers.get(name)
+
+    def borrow(self, name, size=0):
+        buf = self._buffers.get(name)
+        if buf is None or name in self._lent or size > len(buf):
+            self.misses += 1
+            logger.debug("Buffer %s unavailable for %d bytes", name, size)
+            return None
+        self._lent.add(name)
+        return buf
+
+    def give_back(self, name):
+        self._lent.discard(name)
+
+
+class _Writer:
+    def __init__(self, buf):
+        self.buf = buf
+        self.n = 0
+
+    def put(self, text):
+        data = text.encode("utf-8")
+        end = self.n + len(data)
+        if end > len(self.buf):
+            raise ValueError("JSON body does not fit its buffer")
+        self.buf[self.n:end] = data
+        self.n = end
+
+    def value(self, obj):
+        if isinstance(obj, dict):
+            self.put("{")
+            first = True
+            for key, item in obj.items():
+                if not first:
+                    self.put(",")
+                first = False
+                self.put(json.dumps(key))
+                self.put(":")
+                self.value(item)
+            self.put("}")
+        elif isinstance(obj, (list, tuple)):
+            self.put("[")
+            for i, item in enumerate(obj):
+                if i:
+                    self.put(",")
+                self.value(item)
+            self.put("]")
+        else:
+            self.put(json.dumps(obj))
+
+
+def dump_json(obj, buf):
+    """Serialize obj into buf and return a memoryview of the bytes written.
+
+    Keys and values are encoded one at a time, so the serializer builds no
+    string the size of the whole body. Raises ValueError when buf is too small.
+    """
+    writer = _Writer(buf)
+    writer.value(obj)
+    return memoryview(buf)[:writer.n]
+
+
+class BodyFile:
+    """A serialized body in a lent buffer, passed to adafruit_requests as data=.
+
+    Given bytes, the library sends bytes(data), a copy the size of the whole
+    body. Given a binary file it reads the length with seek()/tell() and sends
+    the body through its own small buffer, so this read-only file over the
+    buffer keeps the body out of the heap. It is rewound on every send, so a
+    retried request sends it again.
+    """
+
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def read(self, size=-1):
+        end = len(self._view) if size < 0 else min(self._pos + size, len(self._view))
+        data = bytes(self._view[self._pos:end])
+        self._pos = end
+        return data
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self._view) - self._pos)
+        buf[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
@@ -0,0 +1,105 @@
+# Append-only chat log for T-Deck LLM Chat Application
+
+import os
+import struct
+import logger
+
+
+class ChatLog:
+    """Wrapped chat lines on the SD card with a fixed-width offset index.
+
+    chat.log holds one wrapped line per text line, prefixed with a one-letter
+    role tag. chat.idx holds the byte offset of every line as a 4-byte little
+    endian integer, so any window of lines can be read back with two seeks.
+    """
+
+    def __init__(self, directory):
+        self.log_path = f"{directory}/chat.log"
+        self.index_path = f"{directory}/chat.idx"
+        # Make sure both files exist and learn where they end
+        with open(self.log_path, "ab"):
+            pass
+        with open(self.index_path, "ab"):
+            pass
+        self._log_size = os.stat(self.log_path)[6]
+        self.count = os.stat(self.index_path)[6] // 4
+        self._pending = []  # (tag, text) lines waiting for the next flush
+
+    def append(self, tag, lines):
+        """Queue wrapped lines of one message; nothing touches the card until flush()."""
+        for line in lines:
+            self._pending.append((tag, line))
+
+    def flush(self):
+        """Write queued lines with one write to the log and one to the index."""
+        if not self._pending:
+            return
+        data = bytearray()
+        index = bytearray(4 * len(self._pending))
+        for i, (tag, line) in enumerate(self._pending):
+            struct.pack_into("<I", index, 4 * i, self._log_size + len(data))
+            data += tag.encode("utf-8")
+            data += line.replace("\n", " ").encode("utf-8")
+            data += b"\n"
+        # Log before index, so a reset mid-flush never leaves the index pointing past the log
+        with open(self.log_path, "ab") as f:
+            f.write(data)
+        with open(self.index_path, "ab") as f:
+            f.write(index)
+        self._log_size += len(data)
+        self.count += len(self._pending)
+        self._pending = []
+
+    def read(self, first, n):
+        """Return up to n (tag, text) lines starting at line number first."""
+        n = min(n, self.count - first)
+        if n <= 0:
+            return []
+        with open(self.index_path, "rb") as f:
+            f.seek(4 * first)
+            offset = struct.unpack("<I", f.read(4))[0]
+        lines = []
+        with open(self.log_path, "rb") as f:
+            # Lines are contiguous, so the rest of the window follows the first one
+            f.seek(offset)
+            for _ in range(n):
+                raw = f.readline()
+                if not raw:
+                    break
+                text = raw.decode("utf-8").rstrip("\n")
+                lines.append((text[:1], text[1:]))
+        return lines
+
+
+class MemoryChatLog:
+    """Stand-in for ChatLog when there is no SD card; keeps only the newest lines in RAM."""
+
+    def __init__(self, max_lines=200):
+        self.max_lines = max_lines
+        self._lines = []
+        self.count = 0
+
+    def append(self, tag, lines):
+        for line in lines:
+            self._lines.append((tag, line))
+        excess = len(self._lines) - self.max_lines
+        if excess > 0:
+            del self._lines[:excess]
+        self.count = len(self._lines)
+
+    def flush(self):
+        pass
+
+    def read(self, first, n):
+        return self._lines[first:first + n]
+
+
+def open_chat_log(directory):
+    """Open the SD card chat log, falling back to RAM if the card is missing or read-only."""
+    try:
+        log = ChatLog(directory)
+        logger.info("Chat log on SD card: %d lines in %s", log.count, log.log_path)
+        return log
+    except OSError as e:
+        logger.warning("Chat log unavailable on %s (%s); keeping scrollback in RAM only.", directory, e)
+        return MemoryChatLog()
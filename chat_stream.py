@@ -0,0 +1,111 @@
+# Streaming chat completion helpers for T-Deck LLM Chat Application
+
+import json
+import logger
+from json_stream import JsonStream
+
+# Fields read from a non-streamed completion; everything else in the body is skipped
+COMPLETION_FIELDS = (
+    ("choices", 0, "message", "content"),
+    ("choices", 0, "finish_reason"),
+    ("usage", "*"),
+    ("model",),
+)
+
+
+def _sse_payload(line):
+    """The payload of a `data:` line as bytes, or None for any other line."""
+    line = bytes(line).strip()  # Also drops the trailing \r of \r\n
+    if line.startswith(b"data:"):
+        return line[5:].strip()
+    return None
+
+
+def iter_sse_data(response, buf=None):
+    """Yield the payload of each `data:` line of a server-sent-event response as it arrives.
+
+    The body is read with response._readinto straight into buf (a new 1 KB
+    bytearray unless one is lent), where each line is assembled until its
+    newline arrives. Newlines are looked for in a bytes copy of each read,
+    since bytearray has no find() on CircuitPython. A line longer than buf is
+    dropped.
+    """
+    if buf is None:
+        buf = bytearray(1024)
+    view = memoryview(buf)
+    end = 0  # Bytes of unfinished line at the front of buf
+    overlong = False
+    while True:
+        if end == len(buf):
+            if not overlong:
+                logger.warning("Dropping stream line longer than %d bytes", len(buf))
+            overlong = True
+            end = 0
+        n = response._readinto(view[end:])
+        if not n:
+            break
+        chunk = bytes(view[end:end + n])
+        base = end
+        end += n
+        start = 0
+        i = chunk.find(b"\n")
+        while i >= 0:
+            if not overlong:
+                payload = _sse_payload(view[start:base + i])
+                if payload is not None:
+                    yield payload
+            overlong = False
+            start = base + i + 1
+            i = chunk.find(b"\n", i + 1)
+        if start:
+            # Move the unfinished line to the front; the slice on the right is a copy, so overlap is fine
+            rest = end - start
+            buf[:rest] = buf[start:end]
+            end = rest
+    # Server closed the stream without a trailing newline
+    if end and not overlong:
+        payload = _sse_payload(view[:end])
+        if payload is not None:
+            yield payload
+
+
+def iter_chat_deltas(response, info=None, buf=None):
+    """Yield content fragments from a `stream: true` /chat/completions response.
+
+    If info is given, the usage counts are stored in it when the server sends them.
+    buf, if given, is the line buffer for iter_sse_data.
+    """
+    for data in iter_sse_data(response, buf):
+        if data == b"[DONE]":
+            return
+        try:
+            event = json.loads(data.decode("utf-8"))
+        except ValueError:
+            logger.warning("Skipping malformed stream event: %s", data[:40])
+            continue
+        if info is not None and event.get("usage"):
+            info["usage"] = event["usage"]
+        choices = event.get("choices")
+        if not choices:
+            continue
+        delta = choices[0].get("delta") or {}
+        content = delta.get("content")
+        if content:
+            yield content
+
+
+def iter_completion_content(response, info, buffer_size=256):
+    """Yield content fragments of a non-streamed /chat/completions response as the body is read.
+
+    The body goes through one buffer_size buffer and is never held whole. finish_reason,
+    model and the usage counts are stored in info as they go past.
+    """
+    for path, value, _ in JsonStream(response._readinto, COMPLETION_FIELDS, buffer_size).events():
+        field = path[-1]
+        if field == "content":
+            if value:
+                yield value
+        elif path[0] == "usage":
+            info.setdefault("usage", {})[field] = value
+        else:
+            info[field] = info.get(field, "") + value if isinstance(value, str) else value
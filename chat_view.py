@@ -0,0 +1,110 @@
+# Virtualized chat viewport for T-Deck LLM Chat Application
+
+import displayio
+import terminalio
+from adafruit_display_text import label
+from text_wrap import WrappedText
+
+
+# Color for each role tag stored in the chat log
+ROLE_COLORS = {"u": 0xFFFFFF, "a": 0x00FF00, "s": 0xFFFF00}
+
+
+class ChatViewport:
+    """Draws the chat with one recycled label per visible row.
+
+    Finished messages live in the chat log and are paged back a window at a
+    time; only the visible rows and the message still being written are held in
+    RAM, so memory and redraw cost depend on the screen size rather than on how
+    long the conversation has been going.
+    """
+
+    def __init__(self, log, x=10, y=50, visible_height=170, line_height=15, max_width=300):
+        self.log = log
+        self.line_height = line_height
+        self.max_width = max_width  # Pixels available for text on each row
+        self.rows = visible_height // line_height
+        self.group = displayio.Group(x=x, y=y)
+        self._labels = []
+        for row in range(self.rows):
+            # Label y is the middle of the text, so offset by half a row
+            row_label = label.Label(terminalio.FONT, text="", color=0xFFFFFF, y=row * line_height + line_height // 2)
+            self._labels.append(row_label)
+            self.group.append(row_label)
+        self._tail = WrappedText(max_width)  # Newest message, wrapped as it streams in and not yet in the log
+        self._tail_tag = "u"
+        self._page_first = -1  # First log line held in _page, or -1 if nothing is cached
+        self._page = []
+        self.scroll_offset = 0  # Rows scrolled up from the bottom; 0 follows new output
+        self._dirty = True
+
+    def line_count(self):
+        """Total wrapped lines: everything in the log plus the message being written."""
+        return self.log.count + self._tail.line_count()
+
+    def add_message(self, text, role):
+        """Start a new message below everything else; role is "user", "assistant" or "system"."""
+        self.end_message()
+        self._tail_tag = role[0]
+        self.append_to_last_message(text)
+
+    def append_to_last_message(self, text):
+        """Add text to the newest message, e.g. a token that just streamed in."""
+        before = self._tail.line_count()
+        self._tail.append(text)
+        if self.scroll_offset:
+            # Someone is reading scrollback; keep their lines still while new output arrives below
+            self.scroll_offset += self._tail.line_count() - before
+        self._dirty = True
+
+    def end_message(self):
+        """Commit the newest message to the log; this is the only point the card is written."""
+        lines = self._tail.all_lines()
+        if lines:
+            # The log stores lines already wrapped, so scrolling never has to re-wrap
+            self.log.append(self._tail_tag, lines)
+            self.log.flush()
+            self._page_first = -1
+        self._tail = WrappedText(self.max_width)
+
+    def max_scroll(self):
+        """Furthest number of rows the view can be scrolled up."""
+        return max(0, self.line_count() - self.rows)
+
+    def scroll(self, rows):
+        """Scroll up (positive) or down (negative) by rows, clamped to the scrollback."""
+        offset = min(max(self.scroll_offset + rows, 0), self.max_scroll())
+        if offset != self.scroll_offset:
+            self.scroll_offset = offset
+            self._dirty = True
+
+    def _window(self, first):
+        """(tag, text) for the visible rows starting at line number first."""
+        logged = self.log.count
+        if first < logged:
+            if first != self._page_first:
+                self._page = self.log.read(first, self.rows)
+                self._page_first = first
+            lines = list(self._page)
+        else:
+            lines = []
+        tail_start = max(0, first - logged)
+        for text in self._tail.window(tail_start, self.rows - len(lines)):
+            lines.append((self._tail_tag, text))
+        return lines
+
+    def render(self):
+        """Copy the visible window of lines into the row labels. Returns True if anything changed."""
+        if not self._dirty:
+            return False
+        self._dirty = False
+        first = max(0, self.line_count() - self.rows - self.scroll_offset)
+        lines = self._window(first)
+        for row, row_label in enumerate(self._labels):
+            tag, text = lines[row] if row < len(lines) else ("u", "")
+            color = ROLE_COLORS.get(tag, 0xFFFFFF)
+            if row_label.text != text:
+                row_label.text = text
+            if row_label.color != color:
+                row_label.color = color
+        return True
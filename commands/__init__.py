@@ -0,0 +1,129 @@
+# Slash-command registry for T-Deck LLM Chat Application
+#
+# The table below is all main.py loads. Each command's code lives in a module
+# of this package that is imported the first time one of its commands runs,
+# so boot neither compiles nor keeps bytecode for commands nobody uses. With
+# release set, the module is dropped again after the command, trading a
+# recompile on the next use for the RAM.
+
+import sys
+import json
+import logger
+
+# name -> (module in this package, function in it); each function takes (ctx, args)
+COMMANDS = {
+    "models": ("models", "list_models"),
+    "load": ("models", "load"),
+    "favorites": ("models", "favorites"),
+    "add_favorite": ("models", "add_favorite"),
+    "remove_favorite": ("models", "remove_favorite"),
+    "prompts": ("prompts", "list_prompts"),
+    "save_prompt": ("prompts", "save_prompt"),
+    "load_prompt": ("prompts", "load_prompt"),
+    "edit_prompt": ("prompts", "edit_prompt"),
+    "delete_prompt": ("prompts", "delete_prompt"),
+    "sampler": ("sampler", "show"),
+    "set_sampler": ("sampler", "set_param"),
+    "stats": ("status", "stats"),
+    "servers": ("status", "servers"),
+    "tts": ("status", "tts"),
+}
+
+# Data files the commands keep in sd_card_path; favorites live in the model index (models.json)
+PROMPTS_FILE = "prompts.json"
+SAMPLER_FILE = "sampler.json"
+
+ALIASES = {
+    "list_models": "models",
+    "model": "load",
+    "fav": "favorites",
+    "ls": "models",
+    "?": "help",
+}
+
+
+class Context:
+    """What command handlers may use from the app, gathered once by main.py."""
+
+    def __init__(self, **items):
+        for name, value in items.items():
+            setattr(self, name, value)
+
+
+def load_data(path, default):
+    """A small JSON file from the SD card, or default when it is missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.debug("No data at %s (%s)", path, e)
+        return default
+
+
+def save_data(path, data):
+    try:
+        with open(path, "w") as f:
+            json.dump(data, f)
+    except OSError as e:
+        logger.warning("Could not save %s: %s", path, e)
+
+
+def complete(word, names):
+    """Names word could mean: itself if listed, otherwise every name it is a prefix of, sorted."""
+    if word in names:
+        return [word]
+    return sorted(name for name in names if name.startswith(word))
+
+
+class Registry:
+    """Finds the command for a /line by exact name, alias or unique prefix, and runs it."""
+
+    def __init__(self, ctx, release=False):
+        self.ctx = ctx
+        self.release = release
+
+    def match(self, word):
+        """The command names word could mean; a single entry is a match."""
+        if word in ALIASES:
+            return [ALIASES[word]]
+        return complete(word, list(COMMANDS) + ["help"])
+
+    def run(self, line):
+        """Run one /line; unknown or ambiguous names, and errors, are answered in the chat area."""
+        words = line[1:].split()
+        logger.debug("Command split: %s", words)
+        if not words:
+            self.ctx.show("Commands: " + ", ".join(sorted(COMMANDS)))
+            return
+        matches = self.match(words[0].lower())
+        if not matches:
+            self.ctx.show(f"Unknown command: /{words[0]} (try /help)")
+            return
+        if len(matches) > 1:
+            self.ctx.show(f"/{words[0]} matches: " + ", ".join("/" + name for name in matches))
+            return
+        name = matches[0]
+        if name == "help":
+            self.ctx.show("Commands: " + ", ".join(sorted(COMMANDS)))
+            return
+        module_name, function = COMMANDS[name]
+        full_name = f"{__name__}.{module_name}"
+        loaded = full_name in sys.modules
+        try:
+            if not loaded:
+                __import__(full_name)
+            getattr(sys.modules[full_name], function)(self.ctx, words[1:])
+        except Exception as e:
+            # A command that fails to import (often MemoryError) or run must not take the app down with it
+            logger.exception("Command /%s failed: %s", name, e, exc=e)
+            self.ctx.show(f"/{name} failed: {e}")
+        finally:
+            if self.release and not loaded:
+                self._release(module_name, full_name)
+
+    def _release(self, module_name, full_name):
+        # Both references have to go before the collector can take the module's code
+        sys.modules.pop(full_name, None)
+        package = sys.modules[__name__]
+        if hasattr(package, module_name):
+            delattr(package, module_name)
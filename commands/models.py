@@ -0,0 +1,78 @@
+# Model and favorites commands for T-Deck LLM Chat Application
+
+import logger
+
+
+def resolve_model(ctx, name):
+    """Complete a model name from the catalog; None (after saying why) unless exactly one model matches."""
+    matches = ctx.catalog.complete(name)
+    if len(matches) == 1:
+        return matches[0]
+    if not matches:
+        ctx.show(f"Unknown model: {name} (try /models refresh)")
+    else:
+        ctx.show(f"{name} matches: {', '.join(matches[:5])}")
+    return None
+
+
+def list_models(ctx, args):
+    """/models [refresh]: list the catalog; "refresh" fetches it again first."""
+    catalog = ctx.catalog
+    if args and args[0] == "refresh":
+        if catalog.refresh():
+            ctx.update_context_budget(ctx.config.last_used_model)
+        else:
+            ctx.show("Could not refresh the model list")
+    if not catalog.models:
+        ctx.show("No models known yet (try /models refresh)")
+    for model_id in sorted(catalog.models):
+        ctx.show(catalog.describe(model_id))
+
+
+def load(ctx, args):
+    """/load <model>: load a model (any unique prefix) and make it the one chat uses."""
+    if not args:
+        ctx.show("Usage: /load <model>")
+        return
+    model_name = resolve_model(ctx, args[0])
+    if model_name is None:
+        return
+    config = ctx.config
+    try:
+        response = ctx.routes.request("llm", "POST", "/models", json={"model": model_name}, model=model_name)
+        if response.status_code == 200:
+            logger.info("Model %s loaded successfully.", model_name)
+            ctx.routes.note_loaded("llm", model_name)
+            config.last_used_model = model_name
+            config.save_config()
+            ctx.model_label.text = f"Model: {model_name}"
+            ctx.catalog.mark_loaded(model_name)
+            ctx.update_context_budget(model_name)
+        else:
+            logger.error("Failed to load model. Status code: %d, Response text: %s", response.status_code, response.text)
+            ctx.show(f"Could not load {model_name}: HTTP {response.status_code}")
+        response.close()
+    except Exception as e:
+        logger.exception("Error loading model: %s", e, exc=e)
+        ctx.show(f"Could not load {model_name}: {e}")
+
+
+def favorites(ctx, args):
+    if not ctx.catalog.favorites:
+        ctx.show("No favorite models")
+    for model_id in ctx.catalog.favorites:
+        ctx.show(ctx.catalog.describe(model_id))
+
+
+def add_favorite(ctx, args):
+    model_name = resolve_model(ctx, args[0]) if args else None
+    if model_name:
+        ctx.catalog.add_favorite(model_name)
+        ctx.show(f"Added favorite: {model_name}")
+
+
+def remove_favorite(ctx, args):
+    if args and ctx.catalog.remove_favorite(args[0]):
+        ctx.show(f"Removed favorite: {args[0]}")
+    else:
+        ctx.show("Not a favorite")
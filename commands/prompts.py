@@ -0,0 +1,87 @@
+# Prompt catalog commands for T-Deck LLM Chat Application
+#
+# Saved system prompts live in {sd_card_path}/prompts.json as one object of
+# name -> text. Loading one starts a fresh conversation with it; prompt.txt is
+# still what every boot starts with.
+
+from commands import PROMPTS_FILE, complete, load_data, save_data
+
+
+def _path(ctx):
+    return f"{ctx.config.sd_card_path}/{PROMPTS_FILE}"
+
+
+def _find(ctx, prompts, word):
+    """The saved name word stands for (any unique prefix), or None after saying why."""
+    matches = complete(word, list(prompts))
+    if len(matches) == 1:
+        return matches[0]
+    if matches:
+        ctx.show(f"{word} matches: {', '.join(matches[:5])}")
+    else:
+        ctx.show(f"No saved prompt {word} (see /prompts)")
+    return None
+
+
+def list_prompts(ctx, args):
+    prompts = load_data(_path(ctx), {})
+    if not prompts:
+        ctx.show("No saved prompts (try /save_prompt <name> [text])")
+    for name in sorted(prompts):
+        text = prompts[name]
+        ctx.show(f"{name}: {text[:40]}..." if len(text) > 40 else f"{name}: {text}")
+
+
+def save_prompt(ctx, args):
+    """/save_prompt <name> [text]: save text, or the system prompt in use when there is none."""
+    if not args:
+        ctx.show("Usage: /save_prompt <name> [text]")
+        return
+    text = " ".join(args[1:]) or ctx.conversation.system_prompt
+    if not text:
+        ctx.show("No text to save")
+        return
+    prompts = load_data(_path(ctx), {})
+    prompts[args[0]] = text
+    save_data(_path(ctx), prompts)
+    ctx.show(f"Saved prompt: {args[0]}")
+
+
+def edit_prompt(ctx, args):
+    """/edit_prompt <name> <text>: replace the text of a saved prompt."""
+    if len(args) < 2:
+        ctx.show("Usage: /edit_prompt <name> <text>")
+        return
+    prompts = load_data(_path(ctx), {})
+    name = _find(ctx, prompts, args[0])
+    if name is None:
+        return
+    prompts[name] = " ".join(args[1:])
+    save_data(_path(ctx), prompts)
+    ctx.show(f"Updated prompt: {name}")
+
+
+def load_prompt(ctx, args):
+    """/load_prompt <name>: start a fresh conversation with a saved system prompt."""
+    if not args:
+        ctx.show("Usage: /load_prompt <name>")
+        return
+    prompts = load_data(_path(ctx), {})
+    name = _find(ctx, prompts, args[0])
+    if name is None:
+        return
+    ctx.conversation.set_system_prompt(prompts[name])
+    ctx.show(f"Loaded prompt {name}; new conversation")
+
+
+def delete_prompt(ctx, args):
+    if not args:
+        ctx.show("Usage: /delete_prompt <name>")
+        return
+    prompts = load_data(_path(ctx), {})
+    if args[0] not in prompts:
+        ctx.show(f"No saved prompt {args[0]}")
+        return
+    del prompts[args[0]]
+    save_data(_path(ctx), prompts)
+    ctx.show(f"Deleted prompt: {args[0]}")
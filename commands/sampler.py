@@ -0,0 +1,50 @@
+# Sampler settings commands for T-Deck LLM Chat Application
+#
+# The settings are the dict main.py sends with every chat request, kept in
+# {sd_card_path}/sampler.json. A parameter that is not set is left to the
+# server's default.
+
+from commands import SAMPLER_FILE, complete, save_data
+
+# Parameters LM Studio's /chat/completions accepts, and the type of each
+PARAMS = {
+    "temperature": float,
+    "top_p": float,
+    "top_k": int,
+    "min_p": float,
+    "repeat_penalty": float,
+    "presence_penalty": float,
+    "frequency_penalty": float,
+    "max_tokens": int,
+    "seed": int,
+}
+
+
+def show(ctx, args):
+    if not ctx.sampler:
+        ctx.show("Sampler: server defaults")
+        return
+    ctx.show("Sampler: " + ", ".join(f"{name} {ctx.sampler[name]}" for name in sorted(ctx.sampler)))
+
+
+def set_param(ctx, args):
+    """/set_sampler <parameter> <value|default>: set one parameter (any unique prefix), or hand it back to the server."""
+    if len(args) < 2:
+        ctx.show("Usage: /set_sampler <parameter> <value|default>")
+        ctx.show("Parameters: " + ", ".join(PARAMS))
+        return
+    matches = complete(args[0], list(PARAMS))
+    if len(matches) != 1:
+        ctx.show("Parameters: " + ", ".join(matches or PARAMS))
+        return
+    name = matches[0]
+    if args[1] == "default":
+        ctx.sampler.pop(name, None)
+    else:
+        try:
+            ctx.sampler[name] = PARAMS[name](args[1])
+        except ValueError:
+            ctx.show(f"{name} needs a number, not {args[1]}")
+            return
+    save_data(f"{ctx.config.sd_card_path}/{SAMPLER_FILE}", ctx.sampler)
+    show(ctx, ())
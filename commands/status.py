@@ -0,0 +1,34 @@
+# Status and tuning commands for T-Deck LLM Chat Application
+
+import tts_profiles
+from commands import complete
+
+
+def stats(ctx, args):
+    for line in ctx.stats.lines():
+        ctx.show(line)
+
+
+def servers(ctx, args):
+    """/servers [probe]: health and latency of each server; "probe" checks them all now."""
+    if args and args[0] == "probe":
+        ctx.routes.probe_all()
+    for line in ctx.routes.describe():
+        ctx.show(line)
+
+
+def tts(ctx, args):
+    """/tts [profile]: show the TTS latency settings, or switch profile (any unique prefix)."""
+    config = ctx.config
+    names = tts_profiles.profile_names(config.tts_profiles)
+    if args:
+        matches = complete(args[0], names)
+        if len(matches) != 1:
+            ctx.show(f"TTS profiles: {', '.join(names)}")
+            return
+        config.tts_profile = matches[0]
+        config.save_config()
+    ctx.show(f"TTS profile: {config.tts_profile}")
+    ctx.show(ctx.tts_tuner.describe())
+    params = ctx.tts_latency_params()
+    ctx.show(", ".join(f"{key} {params[key]}" for key in sorted(params)))
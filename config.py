@@ -2,6 +2,7 @@
 
 import json
 import os
+import logger
 
 class Config:
     def __init__(self):
@@ -9,6 +10,8 @@ class Config:
         self.api_key = None
         self.last_used_model = None
         self.logging_enabled = False
+        self.log_level = "info"
+        self.log_to_sd = False
         self.sd_card_path = "/sd"
         self.tts_base_url = None
         self.tts_model_name = None
@@ -20,13 +23,51 @@ class Config:
         self.tts_dtype = None
         self.tts_seed = None
         self.tts_chunked = None
+        self.chat_stream = True
+        self.context_max_tokens = 2048
+        self.models_ttl = 600
+        self.tts_cache_voice = True
+        self.tts_cache_bytes = 4194304
+        self.tts_prewarm = []
+        self.tts_cache_max_chars = 60
+        self.tts_format = "auto"
+        self.tts_pcm_rate = 24000
+        self.cancel_key = "\x1b"
+        self.gateway_url = None
+        self.tts_profile = "balanced"
+        self.tts_profiles = {}
+        self.tts_target_first_audio = 1.0
+        self.llm_endpoints = []
+        self.tts_endpoints = []
+        self.probe_interval = 30
+        self.release_commands = False
 
     def load_config(self):
         config_path = "config.json"
         defaults = {
             "last_used_model": None,
             "logging_enabled": False,
-            "sd_card_path": "/sd"
+            "log_level": "info",
+            "log_to_sd": False,
+            "sd_card_path": "/sd",
+            "chat_stream": True,
+            "context_max_tokens": 2048,
+            "models_ttl": 600,
+            "tts_cache_voice": True,
+            "tts_cache_bytes": 4194304,
+            "tts_prewarm": [],
+            "tts_cache_max_chars": 60,
+            "tts_format": "auto",
+            "tts_pcm_rate": 24000,
+            "cancel_key": "\x1b",
+            "gateway_url": None,
+            "tts_profile": "balanced",
+            "tts_profiles": {},
+            "tts_target_first_audio": 1.0,
+            "llm_endpoints": [],
+            "tts_endpoints": [],
+            "probe_interval": 30,
+            "release_commands": False
         }
         # Check if config file exists (CircuitPython compatible - no os.path)
         config_exists = False
@@ -75,15 +116,27 @@ class Config:
                 
                 
                 # Validate required sensitive configs (after loading)
-                if self.lm_studio_base_url is None or self.api_key is None:
+                if (self.lm_studio_base_url is None or self.api_key is None) and not self.llm_endpoints:
                     raise ValueError("Missing required configuration in config.json: 'lm_studio_base_url' and/or 'api_key'. Please add them to the file.")
                 
-                print(f"Loaded config: base_url={self.lm_studio_base_url}, api_key={self.api_key[:5]}..., model={self.last_used_model}, logging={self.logging_enabled}, sd_path={self.sd_card_path}")
+                logger.info("Loaded config: base_url=%s, api_key=%s..., model=%s, logging=%s, sd_path=%s", self.lm_studio_base_url, (self.api_key or "")[:5], self.last_used_model, self.logging_enabled, self.sd_card_path)
             except Exception as e:
                 raise ValueError(f"Error loading config.json: {e}. Please ensure the file is valid JSON with required fields.")
         else:
             raise ValueError("config.json not found. Please create it with required fields: 'lm_studio_base_url' and 'api_key'.")
 
+    def _servers(self, endpoints, base_url):
+        """[{"url", "api_key"}, ...] from an endpoint list, or the single base_url when the list is empty."""
+        if not endpoints:
+            return [{"url": base_url, "api_key": self.api_key}] if base_url else []
+        return [{"url": entry["url"], "api_key": entry.get("api_key", self.api_key)} for entry in endpoints]
+
+    def llm_servers(self):
+        return self._servers(self.llm_endpoints, self.lm_studio_base_url)
+
+    def tts_servers(self):
+        return self._servers(self.tts_endpoints, self.tts_base_url)
+
     def save_config(self):
         config_path = "config.json"
         data = {
@@ -91,6 +144,8 @@ class Config:
             "api_key": self.api_key,
             "last_used_model": self.last_used_model,
             "logging_enabled": self.logging_enabled,
+            "log_level": self.log_level,
+            "log_to_sd": self.log_to_sd,
             "sd_card_path": self.sd_card_path,
             "tts_base_url": self.tts_base_url,
             "tts_model_name": self.tts_model_name,
@@ -102,10 +157,28 @@ class Config:
             "tts_dtype": self.tts_dtype,
             "tts_seed": self.tts_seed,
             "tts_chunked": self.tts_chunked,
+            "chat_stream": self.chat_stream,
+            "context_max_tokens": self.context_max_tokens,
+            "models_ttl": self.models_ttl,
+            "tts_cache_voice": self.tts_cache_voice,
+            "tts_cache_bytes": self.tts_cache_bytes,
+            "tts_prewarm": self.tts_prewarm,
+            "tts_cache_max_chars": self.tts_cache_max_chars,
+            "tts_format": self.tts_format,
+            "tts_pcm_rate": self.tts_pcm_rate,
+            "cancel_key": self.cancel_key,
+            "gateway_url": self.gateway_url,
+            "tts_profile": self.tts_profile,
+            "tts_profiles": self.tts_profiles,
+            "tts_target_first_audio": self.tts_target_first_audio,
+            "llm_endpoints": self.llm_endpoints,
+            "tts_endpoints": self.tts_endpoints,
+            "probe_interval": self.probe_interval,
+            "release_commands": self.release_commands,
         }
         try:
             with open(config_path, "w") as f:
                 json.dump(data, f, indent=2)
-            print("Config saved to config.json")
+            logger.info("Config saved to config.json")
         except Exception as e:
-            print(f"Error saving config: {e}")
\ No newline at end of file
+            logger.error("Error saving config: %s", e)
\ No newline at end of file
@@ -0,0 +1,186 @@
+# HTTP connection management for T-Deck LLM Chat Application
+
+import time
+import asyncio
+import adafruit_connection_manager
+import socketpool
+import wifi
+import logger
+
+# adafruit_requests raises this, not an OSError, once its own two tries at a request have failed.
+# It stands in as OSError until add_endpoint imports adafruit_requests, which is kept off the boot path.
+OutOfRetries = OSError
+
+
+def split_url(url):
+    """Split "http://host:port/path" into (proto, host, port, path)."""
+    proto, _, rest = url.partition("//")
+    hostport, slash, path = rest.partition("/")
+    host, colon, port = hostport.partition(":")
+    if colon:
+        port = int(port)
+    else:
+        port = 443 if proto == "https:" else 80
+    return proto, host, port, slash + path
+
+
+class Endpoint:
+    """One configured server: its base URL, a session of its own and headers built once."""
+
+    def __init__(self, name, base_url, session, session_id, headers):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.proto, self.host, self.port, _ = split_url(self.base_url)
+        self.session = session
+        self.session_id = session_id
+        self.headers = headers
+        # Seconds for the most recent request: socket setup, response headers, and body consumed
+        self.timings = {"connect": 0.0, "first_byte": 0.0, "total": 0.0}
+        self._started = 0.0
+
+
+class ConnectionManager:
+    """Owns Wi-Fi, the socket pool and one keep-alive session per server.
+
+    Sessions keep their sockets open between requests, so only the first request
+    to each server pays for DNS, TCP and TLS setup. A request that fails on a dead
+    socket is retried on a fresh one; after a dropped Wi-Fi link it fails straight
+    away, and keep_wifi() reconnects in the background.
+    """
+
+    def __init__(self, ssid, password, radio=wifi.radio):
+        self.ssid = ssid
+        self.password = password
+        self.radio = radio
+        self.pool = socketpool.SocketPool(radio)
+        self._sockets = adafruit_connection_manager.get_connection_manager(self.pool)
+        self._ssl_context = None
+        self.endpoints = {}
+
+    def connect_wifi(self, attempts=5, max_delay=30):
+        """Join the network, backing off between failed attempts. Returns True once connected."""
+        delay = 1
+        for attempt in range(attempts):
+            try:
+                if not self.radio.connected:
+                    self.radio.connect(ssid=self.ssid, password=self.password)
+                logger.info("Assigned IP address: %s", self.radio.ipv4_address)
+                return True
+            except (ConnectionError, OSError) as e:
+                if attempt + 1 == attempts:
+                    logger.warning("Wi-Fi connect attempt %d failed: %s", attempt + 1, e)
+                    break
+                logger.warning("Wi-Fi connect attempt %d failed: %s; retrying in %ds", attempt + 1, e, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+        return False
+
+    async def keep_wifi(self, interval=5, max_delay=60):
+        """Background task: reconnect with backoff whenever the link drops."""
+        delay = 1
+        while True:
+            if self.radio.connected:
+                delay = 1
+                await asyncio.sleep(interval)
+                continue
+            logger.warning("Wi-Fi lost; reconnecting")
+            try:
+                self.radio.connect(ssid=self.ssid, password=self.password)
+                logger.info("Wi-Fi reconnected: %s", self.radio.ipv4_address)
+                # Sockets opened on the old link are dead
+                self.close_all()
+            except (ConnectionError, OSError) as e:
+                logger.warning("Wi-Fi reconnect failed: %s; retrying in %ds", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+    def _ssl(self):
+        if self._ssl_context is None:
+            import ssl
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    def add_endpoint(self, name, base_url, api_key=None, extra_headers=None):
+        """Register a server under name; the auth and JSON headers are computed here, once."""
+        headers = {"Content-Type": "application/json"}
+        if api_key and api_key.strip():
+            headers["Authorization"] = f"Bearer {api_key}"
+        if extra_headers:
+            headers.update(extra_headers)
+        global OutOfRetries
+        import adafruit_requests  # Not needed until the network is up, so kept off the boot path
+        OutOfRetries = adafruit_requests.OutOfRetries
+        ssl_context = self._ssl() if base_url.startswith("https://") else None
+        session_id = f"{name}:{base_url}"
+        session = adafruit_requests.Session(self.pool, ssl_context, session_id=session_id)
+        endpoint = Endpoint(name, base_url, session, session_id, headers)
+        self.endpoints[name] = endpoint
+        return endpoint
+
+    def _warm_socket(self, endpoint, timeout):
+        # Get (or reuse) the socket the session is about to ask for, so connect time is measured on its own
+        sock = self._sockets.get_socket(
+            endpoint.host, endpoint.port, endpoint.proto, session_id=endpoint.session_id,
+            timeout=timeout, is_ssl=endpoint.proto == "https:", ssl_context=self._ssl_context)
+        self._sockets.free_socket(sock)
+
+    def request(self, name, method, path, json=None, data=None, stream=False, timeout=60, retries=1):
+        """Send a request to the named endpoint and return the response, headers already read.
+
+        The body is json, or data when it is already encoded (see buffers.BodyFile).
+        Call finished(name) once the body has been consumed to record the total time.
+        """
+        endpoint = self.endpoints[name]
+        url = endpoint.base_url + path
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                self._warm_socket(endpoint, timeout)
+                connected = time.monotonic()
+                response = endpoint.session.request(method, url, data=data, json=json, headers=endpoint.headers, stream=stream, timeout=timeout)
+                endpoint._started = start
+                endpoint.timings["connect"] = connected - start
+                endpoint.timings["first_byte"] = time.monotonic() - start
+                logger.debug("%s %s -> %d (connect %.3fs, first byte %.3fs)", method, url, response.status_code,
+                             endpoint.timings["connect"], endpoint.timings["first_byte"])
+                return response
+            except (OSError, RuntimeError, OutOfRetries) as e:
+                if not self.radio.connected:
+                    # Sockets opened on the old link are dead. Rejoining can take seconds, so it is
+                    # left to keep_wifi() rather than done here with the other tasks stalled
+                    self.close_all()
+                    raise
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                # A kept-alive socket the server has since closed; the retry opens a fresh one
+                logger.warning("%s %s failed (%s); retry %d", method, url, e, attempt)
+
+    def finished(self, name):
+        """Record the total time of the last request to name once its body is consumed."""
+        endpoint = self.endpoints[name]
+        endpoint.timings["total"] = time.monotonic() - endpoint._started
+
+    def abort(self, response):
+        """Drop a response's socket without reading the rest of its body.
+
+        response.close() only hands the socket back to the pool for reuse, unread
+        body and all, and the server keeps generating into it. The next request on
+        that socket then finds stale bytes where the reply should start and has to
+        reconnect. Closing the socket instead tells the server to stop and keeps it
+        out of the pool. Call response.close() afterwards as usual; it then returns
+        straight away.
+        """
+        sock = getattr(response, "socket", None)
+        if sock is None:
+            return
+        response.socket = None
+        try:
+            self._sockets.close_socket(sock)
+        except (OSError, RuntimeError) as e:
+            logger.debug("Closing aborted socket: %s", e)
+
+    def close_all(self):
+        """Drop every pooled socket, e.g. after the Wi-Fi link changed."""
+        adafruit_connection_manager.connection_manager_close_all(self.pool)
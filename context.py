@@ -0,0 +1,85 @@
+# Token-budgeted conversation context for T-Deck LLM Chat Application
+
+import logger
+
+
+def estimate_tokens(text):
+    """Rough token count: ~4 characters per token plus per-message template overhead."""
+    return len(text) // 4 + 4
+
+
+class ConversationContext:
+    """The message list sent with every chat request, kept under a token budget.
+
+    The system prompt and every kept turn are sent byte-identical on each call so
+    the server can reuse its prompt cache. When the history outgrows the budget,
+    the oldest turns are dropped in one go down to a low-water mark rather than
+    one at a time, so the cached prefix stays valid for several turns afterwards.
+    """
+
+    def __init__(self, system_prompt="", budget_tokens=2048, low_water=0.6, reply_reserve=512):
+        self.system_prompt = system_prompt
+        self._system_tokens = estimate_tokens(system_prompt) if system_prompt else 0
+        self.max_budget = budget_tokens
+        self.budget_tokens = budget_tokens
+        self.low_water = low_water  # Fraction of the budget left after a trim
+        self.reply_reserve = reply_reserve  # Tokens kept free for the model's answer
+        self._turns = []  # {"role": ..., "content": ...} in order, without the system prompt
+        self._tokens = []  # Estimated tokens for each entry in _turns
+        self.total_tokens = self._system_tokens
+
+    def set_context_length(self, context_length):
+        """Fit the budget inside the loaded model's context window."""
+        if context_length:
+            self.budget_tokens = max(256, min(self.max_budget, context_length - self.reply_reserve))
+            logger.info("Context budget: %d tokens (model context %d)", self.budget_tokens, context_length)
+            self._trim()
+
+    def add_user(self, text):
+        self._append("user", text)
+
+    def add_assistant(self, text):
+        self._append("assistant", text)
+
+    def drop_last_user(self):
+        """Forget a user message whose request failed, so it is not resent without a reply."""
+        if self._turns and self._turns[-1]["role"] == "user":
+            self._turns.pop()
+            self.total_tokens -= self._tokens.pop()
+
+    def _append(self, role, text):
+        tokens = estimate_tokens(text)
+        self._turns.append({"role": role, "content": text})
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+        self._trim()
+
+    def _trim(self):
+        if self.total_tokens <= self.budget_tokens:
+            return
+        target = int(self.budget_tokens * self.low_water)
+        dropped = 0
+        # Always keep the newest message, and never start the history on an assistant turn
+        while len(self._turns) > 1 and (self.total_tokens > target or self._turns[0]["role"] != "user"):
+            self._turns.pop(0)
+            self.total_tokens -= self._tokens.pop(0)
+            dropped += 1
+        logger.debug("Context trimmed %d messages, now ~%d tokens", dropped, self.total_tokens)
+
+    def messages(self):
+        """The list to send as `messages`: system prompt first, then the kept turns."""
+        if self.system_prompt:
+            return [{"role": "system", "content": self.system_prompt}] + self._turns
+        return list(self._turns)
+
+    def clear(self):
+        """Start a fresh conversation, keeping the system prompt."""
+        self._turns = []
+        self._tokens = []
+        self.total_tokens = self._system_tokens
+
+    def set_system_prompt(self, system_prompt):
+        """Start a fresh conversation under a different system prompt."""
+        self.system_prompt = system_prompt
+        self._system_tokens = estimate_tokens(system_prompt) if system_prompt else 0
+        self.clear()
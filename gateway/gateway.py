@@ -0,0 +1,449 @@
+# Companion gateway for T-Deck LLM Chat Application
+#
+# Runs on the Linux box next to LM Studio and the TTS server. The T-Deck sends
+# one small POST /v1/turn (model, messages, sample rate) and gets back a single
+# chunked reply of frames, described in gateway_client.py: the reply text as it
+# is generated, and each sentence's speech as ready-to-play 16-bit mono PCM at
+# the device's rate. JSON parsing, sentence splitting, resampling and the TTS
+# parameters all stay here, and a turn needs one device connection instead of
+# three. Set gateway_url in the device's config.json to use it.
+#
+#   python gateway/gateway.py                          # reads ./config.json
+#   python gateway/gateway.py --config /path/config.json --port 8090
+
+import argparse
+import array
+import http.client
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+GATEWAY_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(GATEWAY_DIR)
+
+sys.path.insert(0, REPO_DIR)
+
+import logger
+from audio_stream import parse_wav_header
+from gateway_client import FRAME_AUDIO, FRAME_END, FRAME_ERROR, FRAME_INFO, FRAME_TEXT
+from speech_pipeline import SentenceSplitter
+from tts_profiles import profile_params
+
+
+def speech_payload(settings, text):
+    """The /v1/audio/speech request main.py sends, built from the same config.json keys, asking for WAV.
+
+    The "auto" TTS profile is tuned on the device, so here it means "balanced".
+    """
+    params = {
+        "exaggeration": settings.get("tts_exaggeration") or 0.4,
+        "cfg_weight": settings.get("tts_cfg_weight") or 0.5,
+        "temperature": settings.get("tts_temperature") or 0.6,
+        "device": settings.get("tts_device") or "auto",
+        "dtype": settings.get("tts_dtype") or "float16",
+        "cpu_offload": False,
+        "chunked": settings.get("tts_chunked", True),
+        "cache_voice": settings.get("tts_cache_voice", True),
+        "tokens_per_slice": None,
+        "remove_milliseconds": None,
+        "remove_milliseconds_start": None,
+        "chunk_overlap_method": "undefined",
+        "seed": settings.get("tts_seed") or -1,
+    }
+    params.update(profile_params(settings.get("tts_profile") or "balanced", settings.get("tts_profiles")))
+    return {
+        "model": settings.get("tts_model_name") or "chatterbox",
+        "voice": settings.get("tts_voice") or "voices/chatterbox/whywishnotfar.wav",
+        "input": text,
+        "response_format": "wav",  # The header says what rate and channel count to convert from
+        "speed": 1,
+        "stream": True,
+        "params": params,
+    }
+
+
+class Resampler:
+    """Converts 16-bit little-endian PCM to mono at dst_rate, one chunk at a time, by linear interpolation."""
+
+    def __init__(self, channels, src_rate, dst_rate):
+        self.channels = channels
+        self.step = src_rate / dst_rate
+        self._carry = b""  # Bytes of an incomplete frame left over from the last chunk
+        self._prev = None  # Last source sample of the previous chunk
+        self._pos = 0.0  # Next output position, in source samples, relative to _prev
+
+    def convert(self, data):
+        data = self._carry + data
+        frame_bytes = 2 * self.channels
+        usable = len(data) - len(data) % frame_bytes
+        self._carry = data[usable:]
+        samples = array.array("h", data[:usable])
+        if sys.byteorder == "big":
+            samples.byteswap()
+        if self.channels > 1:
+            c = self.channels
+            samples = array.array("h", (sum(samples[i:i + c]) // c for i in range(0, len(samples), c)))
+        if self.step == 1.0 or not samples:
+            out = samples
+        else:
+            source = samples if self._prev is None else array.array("h", [self._prev]) + samples
+            out = array.array("h")
+            pos = self._pos
+            last = len(source) - 1
+            while pos < last:
+                i = int(pos)
+                frac = pos - i
+                out.append(int(source[i] + (source[i + 1] - source[i]) * frac))
+                pos += self.step
+            self._pos = pos - last
+            self._prev = source[-1]
+        if sys.byteorder == "big":
+            out.byteswap()
+        return out.tobytes()
+
+
+class Upstream:
+    """A keep-alive connection to one backend, reopened when the backend drops it."""
+
+    def __init__(self, base_url, headers):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.headers = headers
+        self._connection = None
+
+    def post(self, path, payload):
+        """Send a JSON POST and return the response with its headers read. Read the body to the end before the next call."""
+        body = json.dumps(payload).encode()
+        for attempt in range(2):
+            if self._connection is None:
+                cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self._connection = cls(self.host, self.port, timeout=120)
+            try:
+                self._connection.request("POST", self.prefix + path, body=body, headers=self.headers)
+                return self._connection.getresponse()
+            except (http.client.HTTPException, OSError):
+                # The backend closed the kept-alive connection; open a fresh one once
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class Turn:
+    """One device request. Worker threads produce text and audio frames; the handler thread writes them out."""
+
+    def __init__(self, llm, tts, settings, body):
+        self.llm = llm
+        self.tts = tts
+        self.settings = settings
+        self.model = body.get("model")
+        self.messages = body.get("messages") or []
+        self.sampler = body.get("sampler") or {}  # The device's /set_sampler settings, passed on to LM Studio
+        self.voice = bool(body.get("voice")) and tts is not None
+        self.rate = int(body.get("rate") or 24000)
+        self.frame = int(body.get("frame") or 4096) & ~1  # Audio frames carry whole samples
+        self.frames = queue.Queue()  # (kind, payload) for text, info and error frames; None once generation ends
+        self.audio = queue.Queue()  # PCM frames; None once the last sentence has been spoken
+        self._sentences = queue.Queue()  # Text waiting for TTS; None after the last sentence
+        self.cancelled = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._generate, daemon=True).start()
+        if self.voice:
+            threading.Thread(target=self._speak, daemon=True).start()
+
+    def cancel(self):
+        """The device hung up: drop the backend connections so LM Studio and the TTS server stop too."""
+        self.cancelled.set()
+        self.llm.close()
+        if self.tts is not None:
+            self.tts.close()
+
+    def _generate(self):
+        splitter = SentenceSplitter()
+        try:
+            payload = {"model": self.model, "messages": self.messages, "stream": True,
+                       "stream_options": {"include_usage": True}}
+            payload.update(self.sampler)
+            response = self.llm.post("/chat/completions", payload)
+            if response.status != 200:
+                detail = response.read()[:200].decode("utf-8", "replace")
+                self.frames.put((FRAME_ERROR, f"LLM returned {response.status}: {detail}".encode()))
+                return
+            info = {"model": self.model}
+            for line in response:
+                if self.cancelled.is_set():
+                    return
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                event = json.loads(data)
+                if event.get("model"):
+                    info["model"] = event["model"]
+                if event.get("usage"):
+                    info["usage"] = event["usage"]
+                for choice in event.get("choices") or ():
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        self.frames.put((FRAME_TEXT, content.encode("utf-8")))
+                        if self.voice:
+                            for sentence in splitter.feed(content):
+                                self._sentences.put(sentence)
+                    if choice.get("finish_reason"):
+                        info["finish_reason"] = choice["finish_reason"]
+            response.read()  # The chunked trailer, so the connection can be reused
+            if self.voice:
+                for sentence in splitter.flush():
+                    self._sentences.put(sentence)
+            self.frames.put((FRAME_INFO, json.dumps(info).encode()))
+        except Exception as e:
+            if not self.cancelled.is_set():
+                logger.error("Chat request failed: %s", e)
+                self.llm.close()
+                self.frames.put((FRAME_ERROR, str(e).encode("utf-8")))
+        finally:
+            self._sentences.put(None)
+            self.frames.put(None)
+
+    def _speak(self):
+        scratch = bytearray(64)
+        try:
+            while True:
+                sentence = self._sentences.get()
+                if sentence is None or self.cancelled.is_set():
+                    return
+                try:
+                    self._speak_sentence(sentence, scratch)
+                except (OSError, ValueError, http.client.HTTPException) as e:
+                    # One lost sentence, not the rest of the reply
+                    if self.cancelled.is_set():
+                        return
+                    logger.warning("TTS for %r failed: %s", sentence[:40], e)
+                    self.tts.close()
+        finally:
+            self.audio.put(None)
+
+    def _speak_sentence(self, sentence, scratch):
+        started = time.monotonic()
+        response = self.tts.post("/v1/audio/speech", speech_payload(self.settings, sentence))
+        if response.status != 200:
+            logger.warning("TTS returned %d for %r", response.status, sentence[:40])
+            response.read()
+            return
+        channels, rate, bits, data_len = parse_wav_header(response.readinto, scratch)
+        if bits != 16:
+            raise ValueError(f"Unsupported WAV sample width: {bits} bits")
+        resampler = Resampler(channels, rate, self.rate)
+        pending = bytearray()
+        while not self.cancelled.is_set():
+            chunk = response.read1(16384)
+            if data_len is not None:
+                chunk = chunk[:data_len]
+                data_len -= len(chunk)
+            if not chunk:
+                break
+            pending += resampler.convert(chunk)
+            # Whole frames go out as they fill; only a sentence's last frame is short
+            while len(pending) >= self.frame:
+                self.audio.put(bytes(pending[:self.frame]))
+                del pending[:self.frame]
+        response.read()
+        if pending:
+            self.audio.put(bytes(pending))
+        logger.debug("Spoke %r in %.3fs", sentence[:40], time.monotonic() - started)
+
+
+def first_server(settings, endpoints_key, url_key):
+    """(url, api_key) of the preferred server: the first entry of the endpoint list, else the single url_key."""
+    endpoints = settings.get(endpoints_key)
+    if endpoints:
+        return endpoints[0]["url"], endpoints[0].get("api_key", settings.get("api_key"))
+    return settings.get(url_key), settings.get("api_key")
+
+
+def _headers(api_key):
+    headers = {"Content-Type": "application/json"}
+    if api_key and api_key.strip():
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+
+class Gateway:
+    """The HTTP server and the settings it serves with. Counts device traffic like sim/mock_server.py."""
+
+    def __init__(self, settings, host="0.0.0.0", port=8090, audio_lead=1.0):
+        self.settings = settings
+        llm_url, llm_key = first_server(settings, "llm_endpoints", "lm_studio_base_url")
+        if llm_url is None:
+            raise ValueError("No LLM server: set llm_endpoints or lm_studio_base_url")
+        self.llm_url = llm_url.rstrip("/")
+        self.tts_url, tts_key = first_server(settings, "tts_endpoints", "tts_base_url")
+        self.headers = _headers(llm_key)
+        self.tts_headers = dict(_headers(tts_key), Accept="*/*")
+        # Seconds of audio sent beyond what the device has played; frames queued behind it wait that long
+        self.audio_lead = audio_lead
+        self.requests = {}  # "METHOD /path" -> count
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(_Handler):
+            gateway = server
+        self.httpd = _Server((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.base_url = f"http://{host}:{self.port}"
+
+    def start(self):
+        """Serve on a background thread (for the simulator); the command line uses httpd.serve_forever()."""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def count(self, key):
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def sent(self, n):
+        with self._lock:
+            self.bytes_sent += n
+
+    def opened(self):
+        with self._lock:
+            self.connections += 1
+
+
+class _Server(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        logger.debug("Device connection %s dropped", client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # One kept-alive connection per device
+    gateway = None
+
+    def setup(self):
+        super().setup()
+        self.gateway.opened()
+        # Backend connections live as long as the device's, so turns after the first skip the handshakes
+        self.llm = Upstream(self.gateway.llm_url, self.gateway.headers)
+        self.tts = Upstream(self.gateway.tts_url, self.gateway.tts_headers) if self.gateway.tts_url else None
+
+    def finish(self):
+        super().finish()
+        self.llm.close()
+        if self.tts is not None:
+            self.tts.close()
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def do_POST(self):
+        self.gateway.count(f"POST {self.path}")
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length)) if length else {}
+        except ValueError:
+            body = None
+        if self.path != "/v1/turn" or not isinstance(body, dict):
+            data = b'{"error": "expected POST /v1/turn with a JSON body"}'
+            self.send_response(404 if self.path != "/v1/turn" else 400)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        turn = Turn(self.llm, self.tts, self.gateway.settings, body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        turn.start()
+        try:
+            self._send_frames(turn)
+        except OSError as e:
+            # The device cancelled the turn (or lost Wi-Fi)
+            logger.info("Device hung up mid-turn: %s", e)
+            turn.cancel()
+            self.close_connection = True
+
+    def _frame(self, kind, payload):
+        data = struct.pack(">BH", kind, len(payload)) + payload
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+        self.gateway.sent(len(data))
+
+    def _send_frames(self, turn):
+        """Write text frames as soon as they exist and audio frames no further ahead of playback than audio_lead."""
+        bytes_per_second = turn.rate * 2
+        playback_end = 0.0  # When the audio sent so far will have played out on the device
+        text_done = False
+        audio_done = not turn.voice
+        while not (text_done and audio_done):
+            busy = False
+            while not text_done:
+                try:
+                    frame = turn.frames.get_nowait()
+                except queue.Empty:
+                    break
+                if frame is None:
+                    text_done = True
+                else:
+                    self._frame(*frame)
+                    busy = True
+            now = time.monotonic()
+            if not audio_done and playback_end - now < self.gateway.audio_lead:
+                try:
+                    pcm = turn.audio.get_nowait()
+                except queue.Empty:
+                    pcm = b""
+                if pcm is None:
+                    audio_done = True
+                elif pcm:
+                    self._frame(FRAME_AUDIO, pcm)
+                    playback_end = max(playback_end, now) + len(pcm) / bytes_per_second
+                    busy = True
+            if not busy:
+                time.sleep(0.005)
+        self._frame(FRAME_END, b"")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve T-Deck chat turns with speech over one framed stream.")
+    parser.add_argument("--config", default="config.json", help="the device's config.json (backend URLs and TTS settings)")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8090, help="port to listen on")
+    parser.add_argument("--audio-lead", type=float, default=1.0, help="seconds of audio to send ahead of playback")
+    parser.add_argument("--log-level", default="info", help="debug, info, warning or error")
+    args = parser.parse_args(argv)
+    with open(args.config) as f:
+        settings = json.load(f)
+    logger.configure(args.log_level)
+    gateway = Gateway(settings, args.host, args.port, args.audio_lead)
+    logger.info("Gateway on %s: LLM %s, TTS %s", gateway.base_url, gateway.llm_url, gateway.tts_url)
+    try:
+        gateway.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# Companion gateway client for T-Deck LLM Chat Application
+#
+# With gateway_url set, a chat turn is one POST /v1/turn to gateway/gateway.py,
+# which talks to LM Studio and the TTS server on the device's behalf. The reply
+# is a single chunked body of frames, each a 3-byte header (kind, then payload
+# length as a big-endian uint16) followed by the payload:
+#
+#   TEXT   UTF-8 reply text, whole characters, in the order it was generated
+#   AUDIO  16-bit mono little-endian PCM at the rate the request asked for
+#   INFO   JSON object: finish_reason, model and usage of the completion
+#   ERROR  UTF-8 message; the turn failed
+#   END    empty; nothing follows for this turn
+#
+# Audio frames are at most the requested frame size, and only the last frame of
+# each sentence is shorter, so the player's buffers fill without gaps.
+
+import json
+import logger
+from audio_stream import read_exact
+
+FRAME_END = 0
+FRAME_TEXT = 1
+FRAME_AUDIO = 2
+FRAME_INFO = 3
+FRAME_ERROR = 4
+HEADER_SIZE = 3
+
+
+class GatewayTurn:
+    """One chat turn read from the gateway's framed reply.
+
+    The chat loop reads the frame headers and takes the text. The speech pipeline
+    plays the turn like any other PCM stream, and the player reads audio payloads
+    off the socket through its staging buffer. Frames behind an audio frame
+    wait until the player has read it, so the gateway keeps its audio only a
+    little ahead of playback.
+    """
+
+    audio_format = "pcm"  # Tells the speech pipeline how to decode it
+
+    def __init__(self, response, info, buf=None):
+        self.response = response  # Public so a cancelled turn can drop its socket
+        self.info = info
+        self._buf = buf  # Lent buffer for text and info payloads; larger ones get their own
+        self._header = bytearray(HEADER_SIZE)
+        self._audio_left = 0  # Bytes of the current audio frame still on the socket
+        self.done = False
+
+    def text(self):
+        """Yield reply text as it arrives, or None while the next frame waits behind unplayed audio."""
+        readinto = self.response._readinto
+        while not self.done:
+            if self._audio_left:
+                yield None
+                continue
+            if read_exact(readinto, self._header, HEADER_SIZE) < HEADER_SIZE:
+                raise OSError("Gateway reply ended without an end frame")
+            kind = self._header[0]
+            length = (self._header[1] << 8) | self._header[2]
+            if kind == FRAME_AUDIO:
+                self._audio_left = length
+                continue
+            if self._buf is not None and length <= len(self._buf):
+                payload = memoryview(self._buf)[:length]
+            else:
+                payload = bytearray(length)
+            if read_exact(readinto, payload, length) < length:
+                raise OSError("Gateway reply ended inside a frame")
+            if kind == FRAME_TEXT:
+                yield str(payload, "utf-8")
+            elif kind == FRAME_INFO:
+                self.info.update(json.loads(str(payload, "utf-8")))
+            elif kind == FRAME_ERROR:
+                raise RuntimeError(f"Gateway: {str(payload, 'utf-8')}")
+            elif kind == FRAME_END:
+                self.done = True
+            else:
+                logger.debug("Skipping gateway frame of kind %d", kind)
+
+    def _readinto(self, buf):
+        """Player side: read audio into buf, a byte buffer.
+
+        Returns None when no audio is on hand yet, and 0 once the turn has ended.
+        """
+        if not self._audio_left:
+            return 0 if self.done else None
+        n = self.response._readinto(memoryview(buf)[:min(len(buf), self._audio_left)])
+        self._audio_left -= n
+        return n
+
+    def close(self):
+        pass  # The chat turn owns the response and closes it
@@ -0,0 +1,60 @@
+# Typed input line for T-Deck LLM Chat Application
+
+from text_wrap import char_width
+
+
+class InputBuffer:
+    """The line being typed, edited in place in a fixed bytearray so keystrokes allocate nothing.
+
+    Keys only change the buffer and set dirty; the label is rebuilt at most once
+    per frame from visible(), which shows the end of the line so the cursor stays
+    on screen however long the line gets.
+    """
+
+    def __init__(self, capacity=512, max_width=300, prompt="> "):
+        self._buf = bytearray(capacity)
+        self.length = 0  # Bytes of UTF-8 in use
+        self.max_width = max_width  # Pixels the input label may use, prompt included
+        self.prompt = prompt
+        self.dirty = True
+
+    def insert(self, key):
+        """Append a key's text. Returns False, leaving the line unchanged, once the buffer is full."""
+        data = key.encode("utf-8")
+        end = self.length + len(data)
+        if end > len(self._buf):
+            return False
+        self._buf[self.length:end] = data
+        self.length = end
+        self.dirty = True
+        return True
+
+    def backspace(self):
+        """Remove the last character, including every byte of a multi-byte one."""
+        n = self.length
+        while n and self._buf[n - 1] & 0xC0 == 0x80:
+            n -= 1
+        self.length = max(n - 1, 0)
+        self.dirty = True
+
+    def take(self):
+        """Return the line and clear it."""
+        text = self.text()
+        self.length = 0
+        self.dirty = True
+        return text
+
+    def text(self):
+        return str(self._buf[:self.length], "utf-8")
+
+    def visible(self):
+        """Prompt plus as much of the end of the line as fits in max_width."""
+        text = self.text()
+        width = sum(char_width(ch) for ch in self.prompt)
+        start = len(text)
+        while start:
+            width += char_width(text[start - 1])
+            if width > self.max_width:
+                break
+            start -= 1
+        return self.prompt + text[start:]
@@ -0,0 +1,192 @@
+# Streaming JSON field extraction for T-Deck LLM Chat Application
+#
+# Walks a JSON body straight off the socket through one reusable buffer and
+# reports only the fields asked for, so a response is never held whole in RAM
+# and no dict tree is built. Paths are tuples of keys and list indexes, e.g.
+# ("choices", 0, "message", "content"); "*" in a wanted path matches any key or
+# index at that level.
+
+_WHITESPACE = (0x20, 0x09, 0x0D, 0x0A)
+_DELIMITERS = (0x2C, 0x7D, 0x5D) + _WHITESPACE  # , } ] and whitespace end a number or literal
+_ESCAPES = {
+    ord('"'): b'"', ord("\\"): b"\\", ord("/"): b"/", ord("b"): b"\b",
+    ord("f"): b"\f", ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t",
+}
+
+
+def _utf8_cut(data):
+    """Length of data that ends on a complete UTF-8 character."""
+    n = len(data)
+    for back in range(1, min(4, n) + 1):
+        b = data[n - back]
+        if b & 0xC0 != 0x80:  # Lead byte or ASCII
+            if b >= 0xC0:
+                need = 2 if b < 0xE0 else 3 if b < 0xF0 else 4
+                if back < need:
+                    return n - back
+            return n
+    return n
+
+
+class JsonStream:
+    """Pull-parses a JSON body from readinto, reporting only the wanted paths."""
+
+    def __init__(self, readinto, wanted, buffer_size=256):
+        self._readinto = readinto
+        self._buf = bytearray(buffer_size)
+        self._n = 0
+        self._i = 0
+        self.wanted = [tuple(p) for p in wanted]
+
+    def _fill(self):
+        self._n = self._readinto(self._buf) or 0
+        self._i = 0
+        return self._n
+
+    def _next(self):
+        if self._i >= self._n and not self._fill():
+            return -1
+        b = self._buf[self._i]
+        self._i += 1
+        return b
+
+    def _wants(self, path):
+        for pattern in self.wanted:
+            if len(pattern) == len(path):
+                for want, have in zip(pattern, path):
+                    if want != "*" and want != have:
+                        break
+                else:
+                    return True
+        return False
+
+    def events(self):
+        """Yield (path, value, done) for wanted fields in document order.
+
+        Strings arrive as str fragments, one per buffer refill, with done set on
+        the last one. Numbers, booleans and null arrive whole with done=True.
+        """
+        path = []  # Current key or index at each open container
+        arrays = []  # True for each open container that is a list
+        expect_key = False
+        while True:
+            c = self._next()
+            if c < 0:
+                return
+            if c in _WHITESPACE or c == 0x3A:  # ':'
+                continue
+            if c == 0x7B:  # '{'
+                path.append(None)
+                arrays.append(False)
+                expect_key = True
+            elif c == 0x5B:  # '['
+                path.append(0)
+                arrays.append(True)
+                expect_key = False
+            elif c == 0x7D or c == 0x5D:  # '}' or ']'
+                path.pop()
+                arrays.pop()
+                expect_key = False
+            elif c == 0x2C:  # ','
+                if arrays[-1]:
+                    path[-1] += 1
+                else:
+                    expect_key = True
+            elif c == 0x22:  # '"'
+                if expect_key:
+                    path[-1] = "".join(fragment for fragment, _ in self._string())
+                    expect_key = False
+                elif self._wants(path):
+                    key = tuple(path)
+                    for fragment, done in self._string():
+                        yield key, fragment, done
+                else:
+                    self._skip_string()
+            else:
+                value = self._scalar(c)
+                if self._wants(path):
+                    yield tuple(path), value, True
+
+    def values(self):
+        """Yield (path, value) for wanted fields, joining string fragments; for short fields like ids."""
+        parts = []
+        for path, value, done in self.events():
+            if not done:
+                parts.append(value)
+                continue
+            if parts:
+                parts.append(value)
+                value = "".join(parts)
+                parts = []
+            yield path, value
+
+    def _string(self):
+        """Yield (fragment, done) for the string whose opening quote was just read."""
+        pending = b""  # Decoded escapes and any partial UTF-8 character carried over
+        high = 0  # First half of a \\u surrogate pair
+        while True:
+            if self._i >= self._n and not self._fill():
+                raise ValueError("Unterminated JSON string")
+            buf, i, n = self._buf, self._i, self._n
+            start = i
+            while i < n and buf[i] != 0x22 and buf[i] != 0x5C:
+                i += 1
+            piece = pending + bytes(buf[start:i]) if i > start else pending
+            if i < n and buf[i] == 0x22:
+                self._i = i + 1
+                yield piece.decode("utf-8"), True
+                return
+            if i < n:
+                # Backslash escape; its bytes may continue in the next chunk
+                self._i = i + 1
+                esc = self._next()
+                if esc == 0x75:  # 'u'
+                    code = int(bytes([self._next() for _ in range(4)]), 16)
+                    if 0xD800 <= code < 0xDC00:
+                        high = code
+                        pending = piece
+                        continue
+                    if 0xDC00 <= code < 0xE000 and high:
+                        code = 0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00)
+                    high = 0
+                    pending = piece + chr(code).encode("utf-8")
+                else:
+                    pending = piece + _ESCAPES.get(esc, b"")
+                continue
+            # Buffer used up mid-string: hand over what is complete and keep reading
+            self._i = i
+            cut = _utf8_cut(piece)
+            pending = piece[cut:]
+            if cut:
+                yield piece[:cut].decode("utf-8"), False
+
+    def _skip_string(self):
+        while True:
+            b = self._next()
+            if b == 0x22:
+                return
+            if b == 0x5C:
+                self._next()
+            elif b < 0:
+                raise ValueError("Unterminated JSON string")
+
+    def _scalar(self, first):
+        token = bytearray([first])
+        while True:
+            if self._i >= self._n and not self._fill():
+                break
+            b = self._buf[self._i]
+            if b in _DELIMITERS:
+                break
+            token.append(b)
+            self._i += 1
+        text = bytes(token).decode()
+        if text == "true":
+            return True
+        if text == "false":
+            return False
+        if text == "null":
+            return None
+        if "." in text or "e" in text or "E" in text:
+            return float(text)
+        return int(text)
@@ -0,0 +1,124 @@
+# Leveled logging for T-Deck LLM Chat Application
+#
+# Call sites pass a %-format string and its arguments separately, e.g.
+# logger.debug("Chat URL: %s", url). Nothing is formatted or printed unless the
+# level is enabled, so disabled calls on hot paths cost one comparison.
+
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+_TAGS = {DEBUG: "D", INFO: "I", WARNING: "W", ERROR: "E"}
+
+_level = INFO  # Boot messages show until the config says otherwise
+_serial = True
+_ring = []  # Most recent lines, oldest first once it wraps
+_ring_size = 64
+_ring_next = 0
+_sd_path = None
+_pending = []  # Lines waiting to be appended to the SD card log
+_flush_lines = 32
+
+
+def configure(level="info", serial=True, sd_path=None, ring_size=64):
+    """Set the threshold and where lines go. sd_path=None keeps the log off the card."""
+    global _level, _serial, _ring, _ring_size, _ring_next, _sd_path
+    _level = LEVELS.get(level, INFO) if isinstance(level, str) else level
+    _serial = serial
+    _ring = []
+    _ring_size = ring_size
+    _ring_next = 0
+    _sd_path = f"{sd_path}/app.log" if sd_path else None
+
+
+def configure_from(config_instance):
+    """Apply logging_enabled/log_level/log_to_sd from a loaded Config."""
+    if config_instance.logging_enabled:
+        level = config_instance.log_level
+    else:
+        level = "error"  # Off means only failures reach the console
+    sd_path = config_instance.sd_card_path if config_instance.log_to_sd else None
+    configure(level, sd_path=sd_path)
+
+
+def enabled(level):
+    """True if messages at level would be emitted; guard expensive arguments with this."""
+    return level >= _level
+
+
+def _emit(level, msg, args):
+    global _ring_next
+    if args:
+        msg = msg % args
+    line = f"{time.monotonic():.3f} {_TAGS[level]} {msg}"
+    if _serial:
+        print(line)
+    if len(_ring) < _ring_size:
+        _ring.append(line)
+    else:
+        _ring[_ring_next] = line
+        _ring_next = (_ring_next + 1) % _ring_size
+    if _sd_path is not None:
+        _pending.append(line)
+        if len(_pending) >= _flush_lines:
+            flush()
+
+
+def debug(msg, *args):
+    if DEBUG >= _level:
+        _emit(DEBUG, msg, args)
+
+
+def info(msg, *args):
+    if INFO >= _level:
+        _emit(INFO, msg, args)
+
+
+def warning(msg, *args):
+    if WARNING >= _level:
+        _emit(WARNING, msg, args)
+
+
+def error(msg, *args):
+    if ERROR >= _level:
+        _emit(ERROR, msg, args)
+
+
+def exception(msg, *args, exc=None):
+    """Log msg at error level followed by a traceback: exc's, or the one being handled.
+
+    Pass exc from an except block; CircuitPython builds without sys.exc_info() need it.
+    """
+    if ERROR >= _level:
+        _emit(ERROR, msg, args)
+        if exc is None:
+            import sys
+            exc_info = getattr(sys, "exc_info", None)
+            exc = exc_info()[1] if exc_info is not None else None
+        if exc is not None:
+            import traceback
+            _emit(ERROR, "%s", ("".join(traceback.format_exception(exc)),))
+
+
+def recent():
+    """Lines still in the in-RAM ring buffer, oldest first."""
+    return _ring[_ring_next:] + _ring[:_ring_next]
+
+
+def flush():
+    """Append pending lines to the SD card log in one write."""
+    global _pending
+    if not _pending or _sd_path is None:
+        return
+    lines = _pending
+    _pending = []
+    try:
+        with open(_sd_path, "a") as f:
+            f.write("\n".join(lines))
+            f.write("\n")
+    except OSError as e:
+        print(f"Log flush to {_sd_path} failed: {e}")
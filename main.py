@@ -1,42 +1,43 @@
 # T-Deck LLM Chat Application
 
+# Start the boot clock before anything slow is imported
+import startup
+boot = startup.BootTimer()
+
 import board
 import displayio
 import terminalio
 from adafruit_display_text import label
 from adafruit_st7789 import ST7789
+import gc
 import json
 import time
-import adafruit_requests
-import wifi, os
-import socketpool
+import asyncio
+import os
 from lilygo_tdeck import TDeck  # Uncommented to test after I2C scan
 import config
-import audiobusio
-import audiocore
-import traceback
-
-wifi.radio.connect(ssid=os.getenv('CIRCUITPY_WIFI_SSID'),
-                   password=os.getenv('CIRCUITPY_WIFI_PASSWORD'))
-print("Assigned IP address:", wifi.radio.ipv4_address)
-
-# Add delay for WiFi to fully initialize
-time.sleep(2)  # Wait 2 seconds for connection stability
-dns_servers = wifi.radio.ipv4_dns
-
-# Initialize socket pool for requests
-pool = socketpool.SocketPool(wifi.radio)
-print("Socket pool initialized.")
-
-if dns_servers is None:
-    print("DNS servers: No DNS servers configured")
-else:
-    # Handle single Address or list
-    if hasattr(dns_servers, '__iter__') and not isinstance(dns_servers, (str, bytes)):
-        dns_str = ', '.join(str(d) for d in dns_servers)
-    else:
-        dns_str = str(dns_servers)
-    print(f"DNS servers: {dns_str}")
+import logger
+import connection
+import context
+import model_catalog
+import chat_stream
+import chat_view
+import chat_log
+import audio_stream
+import speech_pipeline
+import tts_cache
+import stats
+import gateway_client
+import input_buffer
+import tts_profiles
+import router
+import buffers
+import commands
+boot.mark("imports")
+
+# The big reused buffers come first, while the heap is still in one piece:
+# request bodies, the chat stream's receive buffer, the MP3 spool and the TTS cache's scratch
+pool = buffers.BufferPool({"body": 16384, "recv": 2048, "spool": 1024, "scratch": 512})
 
 # Initialize the display
 displayio.release_displays()
@@ -59,122 +60,168 @@ welcome_label = label.Label(terminalio.FONT, text="T-Deck LLM Chat", color=0xFFF
 display_group.append(welcome_label)
 
 # Create status bar for model information
-## BUG This says Model: None in the label. It should be updated based upon which model is being loaded.
 model_label = label.Label(terminalio.FONT, text="Model: None", color=0xFFFFFF, x=10, y=30)
 display_group.append(model_label)
+boot.mark("display")
 
 ######### Load configuration on startup
 config_instance = config.Config()
 config_instance.load_config()
-print(f"Config loaded successfully. Using base URL: {config_instance.lm_studio_base_url} | Using API key: {config_instance.api_key[:5]}...")
+# From here on logging follows logging_enabled/log_level/log_to_sd in config.json
+logger.configure_from(config_instance)
+# The last used model is known without asking the server
+if config_instance.last_used_model:
+    model_label.text = f"Model: {config_instance.last_used_model}"
 
 # Load system prompt from file
 system_prompt = ""
 try:
     with open("prompt.txt", "r") as f:
         system_prompt = f.read().strip()
-    print(f"System prompt loaded from prompt.txt ({len(system_prompt)} chars)")
+    logger.info("System prompt loaded from prompt.txt (%d chars)", len(system_prompt))
 except OSError as e:
-    print(f"Warning: Could not load prompt.txt: {e}. Using empty system prompt.")
-
-# Check to see if URL needs HTTPS libraries
-if config_instance.lm_studio_base_url.startswith("https://"):
-    import ssl
-    context = ssl.create_default_context()
-    requests = adafruit_requests.Session(pool, context)
-else:
-    requests = adafruit_requests.Session(pool, None)
-    # Initialize TTS requests session (assume HTTP for TTS-WebUI)
-    tts_requests = adafruit_requests.Session(pool, None)
-    print("TTS HTTP session initialized.")
-
-# Test HTTP request to configured API (basic health check)
-test_url = f"{config_instance.lm_studio_base_url}/models"
-# LOOK HERE Is this why it fails?
-# Conditional auth header if api_key provided
-headers = {}
-if config_instance.api_key and config_instance.api_key.strip():
-    headers["Authorization"] = f"Bearer {config_instance.api_key}"
-# Fails after this print
-print(f"Testing URL: {test_url}")  # Log the configured URL for validation
-try:
-    print(f"Before GET: requests object: {requests}")
-    test_response = requests.get(test_url) #, headers=headers)
-    print(f"After GET: response type: {type(test_response)}")
-    if test_response is not None:
-        print(f"API test status: {test_response.status_code}")
+    logger.warning("Could not load prompt.txt: %s. Using empty system prompt.", e)
+
+# Multi-turn history sent with every chat request, trimmed to a token budget
+conversation = context.ConversationContext(system_prompt, config_instance.context_max_tokens)
+
+# Rolling per-stage timings of recent turns, shown by /stats
+turn_stats = stats.Stats()
+awaiting_audio_since = None  # monotonic_ns of the last chat request until its first audio plays
+
+# One place owns Wi-Fi, the socket pool and the keep-alive HTTP sessions; the network comes up in boot_network()
+connections = connection.ConnectionManager(os.getenv('CIRCUITPY_WIFI_SSID'), os.getenv('CIRCUITPY_WIFI_PASSWORD'))
+# Picks which LLM and TTS server each request goes to, and fails over when one is down
+routes = router.Router(connections)
+
+# Model list and metadata, served from the SD card index and refreshed in the background
+catalog = model_catalog.ModelCatalog(routes, config_instance.sd_card_path, config_instance.models_ttl)
+
+# Spoken clips already synthesized once are replayed from the SD card
+speech_cache = tts_cache.AudioCache(config_instance.sd_card_path, config_instance.tts_cache_bytes, pool.take("scratch"),
+                                    config_instance.tts_cache_max_chars)
+speech_cache.load()
+boot.mark("config")
+
+
+TTS_ENDPOINTS = ("tts", "tts_prefetch")
+
+
+def add_endpoints():
+    """Register every LLM, LM Studio REST and TTS server from the config with the router."""
+    # Sessions for the LLM and TTS servers; https URLs get an SSL context automatically
+    for server in config_instance.llm_servers():
+        # LM Studio's own REST API (model metadata) sits beside the OpenAI-compatible /v1 routes
+        lm_studio_api_root = server["url"].rstrip("/")
+        if lm_studio_api_root.endswith("/v1"):
+            lm_studio_api_root = lm_studio_api_root[:-3]
+        routes.add("llm", server["url"], server["api_key"], {"llm": server["url"], "lmstudio": lm_studio_api_root})
+    if config_instance.gateway_url:
+        # Chat turns, speech included, go through the companion gateway; LM Studio is still used for models
+        routes.add("gateway", config_instance.gateway_url, config_instance.api_key, {"gateway": config_instance.gateway_url})
     else:
-        print("Response is None - potential Session init issue")
-    if test_response.status_code in [200, 401]:  # 401 ok if auth fails, still reachable
-        print("API connectivity confirmed.")
+        # Two sessions per server, so the next sentence can be requested while the current one is still downloading
+        for server in config_instance.tts_servers():
+            routes.add("tts", server["url"], server["api_key"], {name: server["url"] for name in TTS_ENDPOINTS},
+                       {"Accept": "*/*"})
+
+
+def post_json(role, path, payload, **kwargs):
+    """POST payload, serialized into the pooled body buffer; falls back to json= when it does not fit."""
+    body = pool.borrow("body")
+    if body is None:
+        return routes.request(role, "POST", path, json=payload, **kwargs)
+    try:
+        data = buffers.BodyFile(buffers.dump_json(payload, body))
+    except ValueError:
+        logger.debug("Request body over %d bytes; sending it as one string", len(body))
+        pool.give_back("body")
+        return routes.request(role, "POST", path, json=payload, **kwargs)
+    try:
+        return routes.request(role, "POST", path, data=data, **kwargs)
+    finally:
+        pool.give_back("body")
+
+
+def collect_garbage(measure=False):
+    """Run the collector between turn phases, timed as "gc" in /stats; measure also finds the largest free block."""
+    start_ns = time.monotonic_ns()
+    gc.collect()
+    turn_stats.since("gc", start_ns)
+    if measure:
+        turn_stats.sample_largest_block()
+        gc.collect()  # The trial blocks are garbage again
+
+
+def log_dns_servers():
+    dns_servers = connections.radio.ipv4_dns
+    if dns_servers is None:
+        logger.warning("DNS servers: No DNS servers configured")
+    elif logger.enabled(logger.DEBUG):
+        # Handle single Address or list
+        if hasattr(dns_servers, '__iter__') and not isinstance(dns_servers, (str, bytes)):
+            dns_str = ', '.join(str(d) for d in dns_servers)
+        else:
+            dns_str = str(dns_servers)
+        logger.debug("DNS servers: %s", dns_str)
+
+
+def update_context_budget(model):
+    """Size the conversation budget from the model's context length in the catalog."""
+    entry = catalog.get(model)
+    if entry and entry["ctx"]:
+        conversation.set_context_length(entry["ctx"])
     else:
-        print(f"API test failed: {test_response.text}")
-except Exception as net_e:
-    print(f"Network test error: {net_e}")
-    print("Network test details:")
-    # CircuitPython traceback limited; print exception directly
-    import sys
-    sys.print_exception(net_e)
-
-# Auto-load default model if none set
-print("Checking for auto-load model...")
-if config_instance.last_used_model is None:
+        logger.debug("No context length known for %s; keeping context budget", model)
+
+
+def auto_load_model():
+    """Load the default model on first run, when config.json names none."""
     default_model = "phi-4-mini-instruct"
-    print(f"Setting default model: {default_model}")
     config_instance.last_used_model = default_model
-    print("Loading default model...")
+    logger.info("Loading default model %s...", default_model)
     try:
-        url = f"{config_instance.lm_studio_base_url}/models"
-        print(f"Auto-load URL: {url}")
-        headers = {"Authorization": f"Bearer {config_instance.api_key}", "Content-Type": "application/json"}
-        payload = {"model": default_model}
-        response = requests.post(url, json=payload, headers=headers)
-        print(f"After POST (autoload): response type: {type(response)}")
-        if response is not None:
-            print(f"Auto-load response status: {response.status_code}")
-        else:
-            print("Autoload response is None")
+        response = routes.request("llm", "POST", "/models", json={"model": default_model}, model=default_model)
         if response.status_code == 200:
-            print(f"Default model {default_model} loaded successfully.")
+            logger.info("Default model %s loaded successfully.", default_model)
             config_instance.save_config()
             model_label.text = f"Model: {default_model}"
+            catalog.mark_loaded(default_model)
+            routes.note_loaded("llm", default_model)
         else:
-            print(f"Failed to auto-load model. Status: {response.status_code}, Response: {response.text}")
+            logger.error("Failed to auto-load model. Status: %d, Response: %s", response.status_code, response.text)
+        response.close()
     except Exception as e:
-        import traceback
-        print(f"Error auto-loading model: {e}")
-        print("Auto-load traceback:")
-        print(traceback.format_exc())
-else:
-    print(f"Using existing model: {config_instance.last_used_model}")
-    model_label.text = f"Model: {config_instance.last_used_model}"
+        logger.exception("Error auto-loading model: %s", e, exc=e)
 
 
 # Initialize the T-Deck
 tdeck = TDeck()
-print("T-Deck library initialized.")
+logger.debug("T-Deck library initialized.")
+boot.mark("tdeck")
 
 # TTS Functions
-import random  # For seed generation
 
 
-def tts_generate_audio(text, config_instance):
-    """Generate TTS audio bytes from text using OpenAI-compatible API."""
-    print("=== TTS GENERATE START ===")
-    print(f"TTS base_url from config: {getattr(config_instance, 'tts_base_url', 'NOT SET')}")
+# Measures every TTS response; in the "auto" profile it also picks the chunk size
+tts_tuner = tts_profiles.TtsTuner(tts_profiles.profile_params("balanced", config_instance.tts_profiles),
+                                  config_instance.tts_target_first_audio)
+
+
+def tts_latency_params():
+    """Latency settings of the current TTS profile, or the tuner's when the profile is "auto"."""
+    if config_instance.tts_profile == tts_profiles.AUTO:
+        return tts_tuner.params
+    return tts_profiles.profile_params(config_instance.tts_profile, config_instance.tts_profiles)
+
+
+def observe_tts(first_audio, rtf, throughput):
+    tts_tuner.observe(first_audio, rtf, throughput, adjust=config_instance.tts_profile == tts_profiles.AUTO)
+
+
+def tts_generate_audio(text, config_instance, slot=0):
+    """Start TTS for text on session slot (0 or 1) and return a stream to play: a cached clip, or the open streaming response."""
     try:
-        if not config_instance.tts_base_url:
-            print("TTS base_url not configured - skipping TTS")
-            return None
-        url = f"{config_instance.tts_base_url}/v1/audio/speech"
-        import json
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "*/*"
-        }
-        if config_instance.api_key and config_instance.api_key.strip():
-            headers["Authorization"] = f"Bearer {config_instance.api_key}"
-        
         # Use config values, fallback to task defaults
         model = config_instance.tts_model_name or "chatterbox"
         voice = config_instance.tts_voice or "voices/chatterbox/whywishnotfar.wav"
@@ -185,11 +232,23 @@ def tts_generate_audio(text, config_instance):
         dtype = config_instance.tts_dtype or "float16"
         seed = config_instance.tts_seed or -1
         chunked = getattr(config_instance, 'tts_chunked', True)
+
+        # Compressed audio when recent TTS downloads were slow, plain PCM when the link keeps up
+        response_format = audio_stream.choose_format(config_instance.tts_format, tts_tuner.throughput,
+                                                     config_instance.tts_pcm_rate)
+
+        cache_key = speech_cache.key(text, model, voice, exaggeration, cfg_weight, temperature, seed, response_format)
+        clip = speech_cache.open(cache_key)
+        if clip is not None:
+            logger.debug("TTS cache hit: %s", text[:40])
+            clip.audio_format = response_format
+            return clip
+        endpoint = TTS_ENDPOINTS[slot]
+        if endpoint not in routes.endpoints:
+            logger.debug("TTS base_url not configured - skipping TTS")
+            return None
         
         params = {
-            "desired_length": 100,
-            "max_length": 300,
-            "halve_first_chunk": True,
             "exaggeration": exaggeration,
             "cfg_weight": cfg_weight,
             "temperature": temperature,
@@ -197,318 +256,474 @@ def tts_generate_audio(text, config_instance):
             "dtype": dtype,
             "cpu_offload": False,
             "chunked": chunked,
-            "cache_voice": False,
+            "cache_voice": config_instance.tts_cache_voice,
             "tokens_per_slice": None,
             "remove_milliseconds": None,
             "remove_milliseconds_start": None,
             "chunk_overlap_method": "undefined",
             "seed": seed,
-            "use_compilation": True,
-            "max_new_tokens": 1000,
-            "max_cache_len": 1500
         }
+        # Chunk sizing, compilation and caching come from the TTS profile
+        params.update(tts_latency_params())
         
         payload = {
             "model": model,
             "voice": voice,
             "input": text,
-            "response_format": "wav",
+            "response_format": response_format,
             "speed": 1,
             "stream": True,
             "params": params
         }
-        print(f"TTS payload: {json.dumps(payload)}")
-        print(f"POST URL: {url}")
-        print(f"Headers: {headers}")
-        response = tts_requests.post(url, json=payload, headers=headers)
-        print(f"Response status: {response.status_code}")
-        print(f"Response headers: {dict(response.headers)}")
+        if logger.enabled(logger.DEBUG):
+            logger.debug("TTS payload: %s", json.dumps(payload))
+        request_start_ns = time.monotonic_ns()
+        response = post_json(endpoint, "/v1/audio/speech", payload, stream=True)
+        turn_stats.since("tts_request", request_start_ns)
         if response.status_code == 200:
-            audio_bytes = response.content
-            print(f"TTS audio bytes generated: {len(audio_bytes)} bytes")
-            return audio_bytes
+            # Timed for the auto-tuner; MP3 bytes say nothing about audio length, so it only times PCM and WAV
+            bytes_per_second = None if response_format == "mp3" else config_instance.tts_pcm_rate * 2
+            response = tts_profiles.TimedStream(response, request_start_ns, bytes_per_second, observe_tts)
+            # Leave the body on the socket; the player reads it as it arrives, copying it into the cache
+            stream = speech_cache.record(cache_key, response, text)
+            stream.audio_format = response_format  # Tells the speech pipeline how to decode it
+            return stream
         else:
-            print(f"TTS generation failed: {response.status_code} - {response.text}")
+            logger.error("TTS generation failed: %d - %s", response.status_code, response.text)
+            response.close()
             return None
     except Exception as e:
-        print(f"TTS generation error: {e}")
-        import traceback
-        print("TTS traceback:")
-        print(traceback.format_exc())
+        logger.exception("TTS generation error: %s", e, exc=e)
         return None
-    print("=== TTS GENERATE END ===")
 
 
-def play_audio(tdeck, filepath):
-    """Play WAV file via TDeck's speaker."""
-    try:
-        if tdeck.speaker is None:
-            print("TDeck speaker not available")
-            return
-        print("Using TDeck speaker for playback")
-        with open(filepath, "rb") as audio_file:
-            wave = audiocore.WaveFile(audio_file)
-            print("Starting audio playback")
-            tdeck.speaker.play(wave)
-            while tdeck.speaker.playing:
-                pass
-            print("Playback loop completed")
-        print("Audio playback completed.")
-    except Exception as e:
-        print(f"Audio playback error: {e}")
+# One PCM ring shared by every clip
+audio_player = None
+if tdeck.speaker is not None:
+    audio_player = audio_stream.WavStreamPlayer(tdeck.speaker, pcm_rate=config_instance.tts_pcm_rate,
+                                                spool_path=f"{config_instance.sd_card_path}/tts_spool.mp3",
+                                                spool_buf=pool.take("spool"))
+
+
+def discard_tts_stream(stream):
+    """Close a TTS stream that will not be played to the end, dropping its socket so the unread audio is not left on a pooled one."""
+    response = stream
+    while hasattr(response, "response"):
+        response = response.response  # Cache recording and timing wrappers
+    connections.abort(response)
+    stream.close()
+
+
+# Speaks replies sentence by sentence while the rest is still being generated
+speech = speech_pipeline.SpeechPipeline(audio_player, lambda text, slot: tts_generate_audio(text, config_instance, slot),
+                                        discard_stream=discard_tts_stream)
+
 
 # No separate keyboard object; use tdeck directly for get_keypress() (bypassed)
 
-# Create scrollable chat history area
-print("Before chat_history init.")
-chat_history = []  # Will store (text, height) tuples
-print("After chat_history init.")
-chat_history_group = displayio.Group()
-chat_history_group.y = 50  # Position below model_label
-print("Created chat_history_group.")
-display_group.append(chat_history_group)
-print("Appended chat_history_group.")
-
-# Create text input bar
-input_label = label.Label(terminalio.FONT, text="> ", color=0xFFFFFF, x=10, y=220)
+# Create scrollable chat history area; a fixed pool of row labels is recycled as it scrolls
+# Finished messages are paged back from the chat log on the SD card as you scroll
+chat_viewport = chat_view.ChatViewport(chat_log.open_chat_log(config_instance.sd_card_path), x=10, y=50, visible_height=170)
+display_group.append(chat_viewport.group)
+
+# Create text input bar; keys edit typed in place and the label is redrawn from it once per frame
+typed = input_buffer.InputBuffer(max_width=300)
+input_label = label.Label(terminalio.FONT, text=typed.visible(), color=0xFFFFFF, x=10, y=220)
 display_group.append(input_label)
 
-# Helper function to create multi-line labels for long messages
-def create_multi_line_label(text, x, start_y, color, max_chars=50):
-    """Split text into lines and create stacked labels."""
-    words = text.split()
-    lines = []
-    current_line = ""
-    for word in words:
-        test_line = current_line + (word + " " if current_line else word)
-        if len(test_line) <= max_chars:
-            current_line = test_line
+# Trackball scrolls the chat history when the driver exposes it
+read_trackball = getattr(tdeck, "get_trackball", None)
+
+# Shared state between the asyncio tasks
+pending_inputs = []  # Lines submitted with Enter, waiting for the network task
+input_ready = asyncio.Event()
+network_ready = asyncio.Event()  # Set once boot_network() has Wi-Fi and the servers registered
+status_text = "Starting"
+cancel_requested = False  # Set by the cancel key; the running chat turn stops at its next fragment
+FRAME_NS = 1_000_000_000 // 60  # Shortest gap between panel refreshes
+TYPING_NS = 1_000_000_000  # A key this recent means someone is typing, so the keyboard is polled fast
+last_frame_ns = 0
+frame_pending = False  # Something changed too soon after the last refresh; the render task draws it
+collect_pending = False  # A turn ended; the audio task collects garbage once speech is done too
+
+# Status bar (top right) so the user can see what the app is busy with
+status_label = label.Label(terminalio.FONT, text=status_text, color=0xFFFF00, x=230, y=10)
+display_group.append(status_label)
+boot.mark("ui")
+
+
+def draw_frame():
+    """Copy pending changes into the labels and refresh the panel, at most once per FRAME_NS.
+
+    displayio sends only the areas whose labels changed, so a keystroke redraws
+    just the input line. Returns False if the frame was deferred.
+    """
+    global last_frame_ns, frame_pending
+    now = time.monotonic_ns()
+    if now - last_frame_ns < FRAME_NS:
+        frame_pending = True
+        return False
+    changed = frame_pending
+    frame_pending = False
+    if typed.dirty:
+        input_label.text = typed.visible()
+        typed.dirty = False
+        changed = True
+    if chat_viewport.render():
+        changed = True
+    status = "Speaking" if speech.active and status_text == "Ready" else status_text
+    if status_label.text != status:
+        status_label.text = status
+        changed = True
+    if changed:
+        display.refresh()
+        last_frame_ns = now
+        turn_stats.since("render", now)
+    return True
+
+
+def set_status(text):
+    """Show text in the status bar on the next render pass."""
+    global status_text
+    status_text = text
+
+
+def cancel_turn():
+    """Stop the reply being generated and silence speech; what is already on screen stays."""
+    global cancel_requested
+    if status_text in ("Thinking", "Speaking"):
+        cancel_requested = True
+    if speech.active:
+        logger.info("Speech cancelled")
+        speech.stop()
+
+
+def show_system(text):
+    """Show a line of command output in the chat area (and the log)."""
+    logger.info("%s", text)
+    chat_viewport.add_message(text, "system")
+    chat_viewport.end_message()
+
+
+# Sampler settings sent with every chat request; /set_sampler edits them
+sampler_settings = commands.load_data(f"{config_instance.sd_card_path}/{commands.SAMPLER_FILE}", {})
+
+# Slash commands: the registry is a table; each command's module is imported on first use
+command_registry = commands.Registry(commands.Context(
+    config=config_instance, catalog=catalog, routes=routes, conversation=conversation, sampler=sampler_settings,
+    stats=turn_stats, tts_tuner=tts_tuner, tts_latency_params=tts_latency_params, model_label=model_label,
+    update_context_budget=update_context_budget, show=show_system,
+), release=config_instance.release_commands)
+
+
+async def chat_turn(input_text):
+    """Send one chat message and stream the reply onto the screen and into the speech pipeline."""
+    global awaiting_audio_since, cancel_requested
+    cancel_requested = False
+    user_message = f"User: {input_text}"
+    # Jump back to the newest output when the user sends something
+    chat_viewport.scroll(-chat_viewport.scroll_offset)
+    chat_viewport.add_message(user_message, "user")
+    chat_viewport.end_message()
+    # Let the render task draw the user's line before the request blocks
+    await asyncio.sleep(0)
+    conversation.add_user(input_text)
+    response_text = ""
+    response = None
+    try:
+        model = config_instance.last_used_model or "phi-4-mini-instruct"
+        # Earlier turns are resent unchanged so the server's prompt cache still matches
+        payload = {"model": model, "messages": conversation.messages()}
+        gateway = "gateway" in routes.endpoints
+        if sampler_settings:
+            if gateway:
+                payload["sampler"] = sampler_settings
+            else:
+                payload.update(sampler_settings)
+        if gateway:
+            # The gateway holds the TTS settings and sends speech back as PCM frames sized to the player's buffers
+            payload["voice"] = audio_player is not None
+            payload["rate"] = config_instance.tts_pcm_rate
+            payload["frame"] = audio_player.buffer_samples * 2 if audio_player is not None else 4096
+        elif config_instance.chat_stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}  # Token counts for tokens/s in /stats
+        logger.debug("Request payload: %s", payload)
+        if not speech.active:
+            # Last turn's garbage goes before the reply starts allocating; skipped while audio needs the CPU
+            collect_garbage()
+        request_start_ns = time.monotonic_ns()
+        awaiting_audio_since = request_start_ns
+        if gateway:
+            endpoint = "gateway"
+            response = post_json(endpoint, "/v1/turn", payload, stream=True)
         else:
-            if current_line:
-                lines.append(current_line.strip())
-            current_line = word + " "
-    if current_line:
-        lines.append(current_line.strip())
-    
-    labels = []
-    y_offset = start_y
-    for line in lines:
-        label_obj = label.Label(terminalio.FONT, text=line, color=color, x=x, y=y_offset)
-        labels.append(label_obj)
-        y_offset += 15  # line_height
-    print(f"Created {len(lines)} lines for message: {text[:50]}...")
-    return labels, y_offset - start_y  # Return labels and total height
-
-# Main loop
-input_text = ""
-print("time already imported earlier.")
-import time  # Ensure time is imported for sleep
-
-print("Entering main loop...")
-while True:
-    keypress = tdeck.get_keypress()
-    # print("After get_keypress.")
-    if keypress:
-        print(f"Keypress detected: {repr(keypress)}")
-        print(f"Key pressed: {repr(keypress)}")
-        if keypress == "\n":  # Enter key
-            print("Enter key pressed, processing input.")
-            print(f"User input: {input_text}")
-            if input_text:
-                print("Input is not empty, checking for slash command.")
+            endpoint = "llm"
+            # The router prefers a server that already has the model loaded
+            response = post_json(endpoint, "/chat/completions", payload, stream=config_instance.chat_stream, model=model)
+        timings = routes.timings(endpoint)
+        turn_stats.add("connect", int(timings["connect"] * 1000))
+        turn_stats.add("first_byte", int(timings["first_byte"] * 1000))
+        if response.status_code == 200:
+            completion_info = {}
+            first_token_ms = None
+            fragments = 0
+            draw_ns = 0
+            generate_ms = None
+            # Stream lines and frames are assembled in the pooled receive buffer, given back when the turn ends
+            recv_buf = pool.borrow("recv")
+            if gateway:
+                # Text frames come back here; the speech pipeline plays the audio frames
+                turn = gateway_client.GatewayTurn(response, completion_info, recv_buf)
+                if payload["voice"]:
+                    speech.add_stream(turn)
+                fragment_source = turn.text()
+            elif config_instance.chat_stream:
+                # Draw tokens as the server-sent events arrive
+                fragment_source = chat_stream.iter_chat_deltas(response, completion_info, recv_buf)
             else:
-                print("Input is empty, ignoring.")
-            if input_text.startswith("/"):
-                print("Input starts with /, parsing command.")
-                # Parse slash command
-                command = input_text[1:].split()
-                print(f"Command split: {command}")
-                if command and command[0] == "models":
-                    try:
-                        url = f"{config_instance.lm_studio_base_url}/models"
-                        # Conditional auth header if api_key provided
-                        headers = {}
-                        if config_instance.api_key and config_instance.api_key.strip():
-                            headers["Authorization"] = f"Bearer {config_instance.api_key}"
-                        print("Headers created.")
-                        response = requests.get(url, headers=headers)
-                        print(f"GET response received, status: {response.status_code}")
-                        if response.status_code == 200:
-                            print("Status 200, parsing JSON.")
-                            models = response.json()
-                            print("JSON parsed successfully.")
-                            print("Available models:")
-                            print(f"Models data: {models}")
-                            print("Before iterating models.")
-                            for model in models["data"]:
-                                print(f"Model ID: {model['id']}")
-                                print(model["id"])
-                            print("Finished iterating models.")
-                        else:
-                            print(f"Failed to fetch models. Status code: {response.status_code}")
-                            print(f"Response text: {response.text}")
-                    except Exception as e:
-                        print(f"Error fetching models: {e}")
-                elif command and command[0] == "load":
-                    print("Processing /load command.")
-                    if len(command) > 1:
-                        print("Command has model name.")
-                        model_name = command[1]
-                        try:
-                            url = f"{config_instance.lm_studio_base_url}/models"
-                            # Conditional auth header if api_key provided
-                            headers = {"Content-Type": "application/json"}
-                            if config_instance.api_key and config_instance.api_key.strip():
-                                headers["Authorization"] = f"Bearer {config_instance.api_key}"
-                            print("Load headers created.")
-                            print("Before POST request for load.")
-                            response = requests.post(url, json={"model": model_name}, headers=headers)
-                            print(f"POST response status: {response.status_code}")
-                            if response.status_code == 200:
-                                print("Load successful, status 200.")
-                                print(f"Model {model_name} loaded successfully.")
-                                print("Before setting last_used_model.")
-                                config_instance.last_used_model = model_name
-                                print("Last used model set.")
-                                print("Before save_config.")
-                                config_instance.save_config()
-                                print("Config saved.")
-                                # Update the model label
-                                print("Before updating model_label.")
-                                model_label.text = f"Model: {model_name}"
-                                print("Model label updated.")
-                            else:
-                                print(f"Failed to load model. Status code: {response.status_code}")
-                                print(f"Response text: {response.text}")
-                        except Exception as e:
-                            print(f"Error loading model: {e}")
-                            import traceback
-                            print("Load traceback:")
-                            print(traceback.format_exc())
-                    else:
-                        print("Please specify a model name.")
-                    print("Finished /load processing.")
+                # Pull the content out of the body as it is read instead of building the whole JSON tree
+                fragment_source = chat_stream.iter_completion_content(response, completion_info)
+            chat_viewport.add_message("YoYo:: ", "assistant")
+            try:
+                for fragment in fragment_source:
+                    if cancel_requested:
+                        break
+                    if fragment is None:
+                        # Gateway turn: the next frames wait behind audio the speaker has not taken yet
+                        if generate_ms is None and "finish_reason" in completion_info:
+                            generate_ms = turn_stats.since("generate", request_start_ns)
+                            set_status("Speaking")
+                        await asyncio.sleep(0.01)
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = turn_stats.since("ttft", request_start_ns)
+                        logger.info("Time to first token: %dms", first_token_ms)
+                    fragments += 1
+                    draw_start_ns = time.monotonic_ns()
+                    response_text += fragment
+                    chat_viewport.append_to_last_message(fragment)
+                    if not gateway:
+                        speech.add(fragment)
+                    draw_ns += time.monotonic_ns() - draw_start_ns
+                    # Hand the CPU to keyboard, render and audio between tokens
+                    await asyncio.sleep(0)
+            finally:
+                if cancel_requested:
+                    # Hanging up is what makes LM Studio stop generating; close() would wait for the rest
+                    connections.abort(response)
+                    chat_viewport.append_to_last_message(" [stopped]")
+                response.close()
+                if recv_buf is not None:
+                    pool.give_back("recv")
+                routes.finished(endpoint)
+                log_start_ns = time.monotonic_ns()
+                chat_viewport.end_message()
+                turn_stats.since("log_write", log_start_ns)
+            if cancel_requested:
+                logger.info("Reply cancelled after %d fragments", fragments)
+                awaiting_audio_since = None
+                speech.stop()
+                if response_text:
+                    conversation.add_assistant(response_text)
                 else:
-                    print(f"Unknown command: {command[0] if command else 'empty'}")
-                print("Finished slash command processing.")
+                    conversation.drop_last_user()
+                return
+            if generate_ms is None:
+                generate_ms = turn_stats.since("generate", request_start_ns)
+            turn_stats.add("draw", draw_ns // 1_000_000)
+            # Streamed deltas are about one token each when the server sends no usage
+            tokens = completion_info.get("usage", {}).get("completion_tokens") or fragments
+            if first_token_ms is not None and generate_ms > first_token_ms:
+                turn_stats.add("tok_per_s", tokens * 1000 / (generate_ms - first_token_ms))
+            logger.info("Reply finished in %dms", generate_ms)
+            logger.debug("Finish reason: %s, usage: %s", completion_info.get("finish_reason"), completion_info.get("usage"))
+            logger.debug("YoYo:: %s", response_text)
+
+            # TTS Integration: earlier sentences are already queued; the audio task speaks the tail
+            speech.finish()
+            conversation.add_assistant(response_text)
+        else:
+            logger.error("Failed to send chat request. Status code: %d, Response text: %s", response.status_code, response.text)
+            response.close()
+            conversation.drop_last_user()
+    except Exception as e:
+        speech.stop()
+        if response is not None and isinstance(e, (OSError, connection.OutOfRetries)):
+            # The server went away mid-reply; the next turn goes to another one
+            routes.failed(endpoint, e)
+        # Keep whatever part of the reply made it to the screen
+        if response_text:
+            conversation.add_assistant(response_text)
+        else:
+            conversation.drop_last_user()
+        logger.exception("Error sending chat request: %s", e, exc=e)
+
+
+def handle_key(keypress):
+    """Apply one key to the input line; Enter hands the line to the network task."""
+    if keypress == config_instance.cancel_key:
+        cancel_turn()
+    elif keypress == "\n":  # Enter key
+        if typed.length:
+            line = typed.take()
+            logger.debug("User input: %s", line)
+            pending_inputs.append(line)
+            input_ready.set()
+    elif keypress == "\b":  # Backspace key
+        typed.backspace()
+    elif not typed.insert(keypress):
+        logger.debug("Input line full; dropped %r", keypress)
+
+
+async def keyboard_task():
+    """Drain every queued key in one pass, then draw once; polls fast while typing and slowly when idle."""
+    last_key_ns = -TYPING_NS
+    while True:
+        drawn = False
+        keypress = tdeck.get_keypress()
+        if keypress:
+            while keypress:
+                handle_key(keypress)
+                keypress = tdeck.get_keypress()
+            last_key_ns = time.monotonic_ns()
+            drawn = True
+        if read_trackball is not None:
+            state = read_trackball()
+            up, down = state[:2]
+            if up or down:
+                chat_viewport.scroll(up - down)
+                drawn = True
+            if len(state) > 4 and state[4]:  # Trackball click
+                cancel_turn()
+        if drawn:
+            draw_frame()
+        typing = time.monotonic_ns() - last_key_ns < TYPING_NS
+        await asyncio.sleep(0.005 if typing else 0.03)
+
+
+async def boot_network(max_delay=30):
+    """Background boot: Wi-Fi, model catalog and model auto-load, with progress in the status bar."""
+    started = time.monotonic()
+    set_status("Wi-Fi")
+    # Let the prompt draw before the first blocking connect
+    await asyncio.sleep(0)
+    has_index = catalog.load()
+    delay = 1
+    while not connections.connect_wifi(attempts=1):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_delay)
+    log_dns_servers()
+    add_endpoints()
+    boot.mark("wifi", started)
+
+    if routes.needs_probes():
+        # Latency and loaded models of every server, so the first requests already go to the best one
+        started = time.monotonic()
+        set_status("Probing")
+        await asyncio.sleep(0)
+        routes.probe_all()
+        for line in routes.describe():
+            logger.info("Server %s", line)
+        boot.mark("probe", started)
+
+    # The first catalog fetch doubles as the API health check; a saved index waits for the background refresh
+    started = time.monotonic()
+    if not has_index:
+        set_status("Models")
+        await asyncio.sleep(0)
+        logger.info("Model catalog from: %s", config_instance.lm_studio_base_url)  # Log the configured URL for validation
+        if catalog.refresh():
+            logger.info("API connectivity confirmed.")
+        else:
+            logger.error("API test failed: could not list models at %s", config_instance.lm_studio_base_url)
+    boot.mark("catalog", started)
+
+    if config_instance.last_used_model is None:
+        started = time.monotonic()
+        set_status("Loading")
+        await asyncio.sleep(0)
+        auto_load_model()
+        boot.mark("model", started)
+    update_context_budget(config_instance.last_used_model)
+
+    boot.report()
+    collect_garbage(measure=True)
+    set_status("Ready")
+    network_ready.set()
+    asyncio.create_task(connections.keep_wifi())
+    asyncio.create_task(routes.keep_probing(lambda: network_idle() and not speech.active, config_instance.probe_interval))
+    asyncio.create_task(catalog.keep_fresh(network_idle, lambda: update_context_budget(config_instance.last_used_model)))
+    if config_instance.tts_prewarm:
+        asyncio.create_task(speech_cache.prewarm(config_instance.tts_prewarm, lambda text: tts_generate_audio(text, config_instance),
+                                                 lambda: network_idle() and not speech.active, discard_tts_stream))
+
+
+async def network_task():
+    """Run submitted commands and chat turns one at a time."""
+    global collect_pending
+    # Lines typed during boot stay queued until the servers are reachable
+    await network_ready.wait()
+    while True:
+        await input_ready.wait()
+        input_ready.clear()
+        while pending_inputs:
+            line = pending_inputs.pop(0)
+            if line.startswith("/"):
+                set_status("Busy")
+                command_registry.run(line)
             else:
-                print("Regular chat message, not a command.")
-                print("Before appending user input to history.")
-                user_message = f"User: {input_text}"
-                line_height = 15
-                base_y = 50 + sum(prev_height for _, prev_height in chat_history)  # Sum prior heights
-                user_labels, user_height = create_multi_line_label(user_message, 10, base_y, 0xFFFFFF)
-                for lbl in user_labels:
-                    chat_history_group.append(lbl)
-                chat_history.append((user_message, user_height))  # Store text and height
-                print(f"Displayed user message at base_y={base_y}, height={user_height}")
-                
-                # Basic scrolling for chat history
-                visible_height = 170
-                total_y = base_y + user_height
-                if total_y > visible_height:
-                    scroll_amount = total_y - visible_height
-                    chat_history_group.y -= scroll_amount
-                    print(f"Scrolled chat history up by {scroll_amount}px")
-                try:
-                    print("Inside chat try.")
-                    model = config_instance.last_used_model or "phi-4-mini-instruct"
-                    print(f"Selected model: {model}")
-                    url = f"{config_instance.lm_studio_base_url}/chat/completions"
-                    print(f"Chat URL: {url}")
-                    print(f"Sending chat request to {url} with model {model}")
-                    print("Before chat headers.")
-                    # Conditional auth header if api_key provided
-                    headers = {"Content-Type": "application/json"}
-                    if config_instance.api_key and config_instance.api_key.strip():
-                        headers["Authorization"] = f"Bearer {config_instance.api_key}"
-                    print("Chat headers created.")
-                    print("Before chat POST request.")
-                    messages = [{"role": "user", "content": input_text}]
-                    if system_prompt:
-                        messages.insert(0, {"role": "system", "content": system_prompt})
-                    payload = {"model": model, "messages": messages}
-                    print(f"Request payload: {payload}")
-                    response = requests.post(url, json=payload, headers=headers)
-                    print(f"Chat response status: {response.status_code}")
-                    if response.status_code == 200:
-                        assistant_response = response.json()
-                        print(f"YoYo:: {assistant_response['choices'][0]['message']['content']}")
-                        # Display assistant's message
-                        assistant_message = f"YoYo:: {assistant_response['choices'][0]['message']['content']}"
-                        print(f"Assistant message created: {assistant_message[:50]}...")
-                        line_height = 15
-                        base_y = 50 + sum(prev_height for _, prev_height in chat_history)  # Sum prior heights
-                        assistant_labels, assistant_height = create_multi_line_label(assistant_message, 10, base_y, 0x00FF00)
-                        for lbl in assistant_labels:
-                            chat_history_group.append(lbl)
-                        chat_history.append((assistant_message, assistant_height))  # Store text and height
-                        print(f"Displayed assistant message at base_y={base_y}, height={assistant_height}")
-                        
-                        # TTS Integration: Generate and play audio for assistant response
-                        try:
-                            # Debug config TTS attributes
-                            print(f"Config TTS base_url: {getattr(config_instance, 'tts_base_url', 'NOT SET')}")
-                            print(f"Config TTS model: {getattr(config_instance, 'tts_model_name', 'NOT SET')}")
-                            print("=== TTS INTEGRATION START ===")
-                            
-                            response_text = assistant_response['choices'][0]['message']['content']
-                            print(f"TTS input text length: {len(response_text)} chars")
-                            audio_bytes = tts_generate_audio(response_text, config_instance)
-                            print(f"TTS returned audio_bytes length: {len(audio_bytes) if audio_bytes else 'None'}")
-                            if audio_bytes:
-                                temp_file = f"{config_instance.sd_card_path}/temp_audio.wav"
-                                with open(temp_file, "wb") as f:
-                                    f.write(audio_bytes)
-                                print(f"Audio bytes written to {temp_file}")
-                                play_audio(tdeck, temp_file)
-                                # Cleanup temp file
-                                try:
-                                    os.remove(temp_file)
-                                    print("Temp audio file deleted.")
-                                except OSError as e:
-                                    print(f"Failed to delete temp file: {e}")
-                        except Exception as tts_e:
-                            print(f"TTS integration error: {tts_e}")
-                            print("=== TTS INTEGRATION END ===")
-                        
-                        # Basic scrolling for chat history
-                        visible_height = 170
-                        total_y = base_y + assistant_height
-                        if total_y > visible_height:
-                            scroll_amount = total_y - visible_height
-                            chat_history_group.y -= scroll_amount
-                            print(f"Scrolled chat history up by {scroll_amount}px")
-                    else:
-                        print(f"Failed to send chat request. Status code: {response.status_code}")
-                        print(f"Chat response text: {response.text}")
-                except Exception as e:
-                    print(f"Error sending chat request: {e}")
-                    print("After chat try block.")
-            print("Resetting input_text.")
-            input_text = ""
-            input_label.text = "> "
-        elif keypress == "\b":  # Backspace key
-            input_text = input_text[:-1]
-            input_label.text = f"> {input_text}"
+                set_status("Thinking")
+                await chat_turn(line)
+            set_status("Ready")
+            # Turn boundary: push any batched log lines and cache bookkeeping to the SD card
+            logger.flush()
+            speech_cache.flush()
+            collect_pending = True
+            await asyncio.sleep(0)
+
+
+def network_idle():
+    """True when no command or chat turn is running or queued."""
+    return status_text == "Ready" and not pending_inputs
+
+
+async def render_task():
+    """Draw streamed text, status changes and deferred frames; keystrokes are drawn by the keyboard task."""
+    while True:
+        draw_frame()
+        turn_stats.sample_memory()
+        if frame_pending:
+            await asyncio.sleep(max(FRAME_NS - (time.monotonic_ns() - last_frame_ns), 0) / 1_000_000_000)
         else:
-            input_text += keypress
-            input_label.text = f"> {input_text}"
-        print("Finished keypress handling.")
-        
-    # print("No keypress or handled, before sleep.")
-    # print("Before sleep.")
-    time.sleep(0.1)  # Sleep to avoid busy-waiting
-    # print("After sleep.")
+            await asyncio.sleep(0.03)
+
+
+async def audio_task():
+    """Keep the speaker fed; sleeps between buffer refills instead of spinning on speaker.playing."""
+    global awaiting_audio_since, collect_pending
+    while True:
+        pump_start_ns = time.monotonic_ns()
+        if speech.pump():
+            turn_stats.since("audio_pump", pump_start_ns)
+            if awaiting_audio_since is not None and audio_player.speaker.playing:
+                turn_stats.since("ttfa", awaiting_audio_since)
+                awaiting_audio_since = None
+            await asyncio.sleep(0.005)
+        else:
+            if collect_pending and network_idle():
+                # The turn is over, speech included: tidy the heap while nothing is waiting on the CPU
+                collect_pending = False
+                collect_garbage(measure=True)
+            await asyncio.sleep(0.05)
 
-# Use the provided API endpoints to fetch available models and send chat requests
-# TODO: Implement using the provided API endpoints to fetch available models and send chat requests
 
-# Handle API responses and errors gracefully
-# TODO: Implement handling API responses and errors gracefully
+async def main():
+    logger.info("Entering main loop...")
+    # From here the tasks refresh the panel themselves, once per frame and only when something changed
+    display.auto_refresh = False
+    boot.interactive()
+    await asyncio.gather(keyboard_task(), render_task(), audio_task(), network_task(), boot_network())
 
-# Debug and fix any issues encountered during testing
-# TODO: Implement debugging and fixing any issues encountered during testing
 
-# Ensure the application is stable and responsive
-# TODO: Implement ensuring the application is stable and responsive
+asyncio.run(main())
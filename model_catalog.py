@@ -0,0 +1,164 @@
+# Cached model catalog for T-Deck LLM Chat Application
+
+import json
+import time
+import asyncio
+import logger
+from json_stream import JsonStream
+
+# Only these fields of each data[] entry are read; the rest of the listing is skipped as it streams past
+LISTING_FIELDS = (("data", "*", "id"),)
+DETAIL_FIELDS = LISTING_FIELDS + tuple(
+    ("data", "*", field) for field in ("type", "state", "arch", "max_context_length", "loaded_context_length"))
+
+
+class ModelCatalog:
+    """Known models and favorites, served from a small index on the SD card.
+
+    The index (models.json) keeps one compact entry per model: id, loaded state,
+    context length and architecture. /models, /load and completion read it
+    without touching the network. The index kept on the card is served straight
+    away after boot but counts as stale until the first refresh. A refresh then
+    runs in the background whenever the data is older than ttl seconds.
+    """
+
+    def __init__(self, connections, directory, ttl=600):
+        self.connections = connections
+        self.index_path = f"{directory}/models.json"
+        self.ttl = ttl
+        self.models = {}  # id -> {"loaded": bool, "ctx": int or None, "arch": str or None}
+        self.favorites = []
+        self.fetched_at = None  # time.monotonic() of the last refresh in this boot
+
+    def load(self):
+        """Read the index from the SD card. Returns True if it held any models."""
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.info("No model index at %s (%s)", self.index_path, e)
+            return False
+        for model_id, loaded, ctx, arch in data.get("models", []):
+            self.models[model_id] = {"loaded": bool(loaded), "ctx": ctx, "arch": arch}
+        self.favorites = data.get("favorites", [])
+        logger.info("Model index: %d models, %d favorites", len(self.models), len(self.favorites))
+        return bool(self.models)
+
+    def save(self):
+        """Write the index back in its compact list form."""
+        data = {
+            "models": [[model_id, int(m["loaded"]), m["ctx"], m["arch"]] for model_id, m in self.models.items()],
+            "favorites": self.favorites,
+        }
+        try:
+            with open(self.index_path, "w") as f:
+                json.dump(data, f)
+        except OSError as e:
+            logger.warning("Could not save model index to %s: %s", self.index_path, e)
+
+    def is_stale(self):
+        return self.fetched_at is None or time.monotonic() - self.fetched_at > self.ttl
+
+    def _get_entries(self, endpoint, path, fields):
+        """GET path and return its data[] entries as small dicts holding only fields, or None on failure."""
+        if endpoint not in self.connections.endpoints:
+            return None
+        try:
+            response = self.connections.request(endpoint, "GET", path)
+            drained = False
+            try:
+                if response.status_code != 200:
+                    logger.warning("GET %s failed: %d", path, response.status_code)
+                    return None
+                entries = []
+                for (_, index, field), value in JsonStream(response._readinto, fields).values():
+                    while len(entries) <= index:
+                        entries.append({})
+                    entries[index][field] = value
+                drained = True  # The parser reads to the end of the body
+                return entries
+            finally:
+                if not drained:
+                    # An unread body would be left on the pooled socket for the next request to trip over
+                    self.connections.abort(response)
+                response.close()
+        except Exception as e:
+            logger.warning("GET %s failed: %s", path, e)
+        return None
+
+    def refresh(self):
+        """Fetch /v1/models and /api/v0/models and rebuild the index. Returns True on success."""
+        listing = self._get_entries("llm", "/models", LISTING_FIELDS)
+        details = self._get_entries("lmstudio", "/api/v0/models", DETAIL_FIELDS)
+        if listing is None and details is None:
+            return False
+        models = {}
+        # The OpenAI listing decides which ids chat accepts; LM Studio's adds the metadata
+        for entry in listing or ():
+            models[entry["id"]] = {"loaded": False, "ctx": None, "arch": None}
+        for entry in details or ():
+            if "id" not in entry:
+                continue
+            if entry.get("type") == "embeddings":
+                # /v1/models lists embedding models too, but chat cannot use them
+                models.pop(entry["id"], None)
+                continue
+            models[entry["id"]] = {
+                "loaded": entry.get("state") == "loaded",
+                "ctx": entry.get("loaded_context_length") or entry.get("max_context_length"),
+                "arch": entry.get("arch"),
+            }
+        self.models = models
+        self.fetched_at = time.monotonic()
+        self.save()
+        logger.info("Model catalog refreshed: %d models", len(models))
+        return True
+
+    async def keep_fresh(self, is_idle, on_refresh=None, interval=30):
+        """Background task: refresh a stale catalog, but only while is_idle() says nothing else needs the network."""
+        while True:
+            await asyncio.sleep(interval)
+            if self.is_stale() and is_idle():
+                if self.refresh() and on_refresh is not None:
+                    on_refresh()
+
+    def get(self, model_id):
+        return self.models.get(model_id)
+
+    def complete(self, prefix):
+        """Ids starting with prefix, also matching the part after a "publisher/" path; exact match wins."""
+        if prefix in self.models:
+            return [prefix]
+        prefix = prefix.lower()
+        matches = []
+        for model_id in self.models:
+            lowered = model_id.lower()
+            if lowered.startswith(prefix) or lowered.rpartition("/")[2].startswith(prefix):
+                matches.append(model_id)
+        matches.sort()
+        return matches
+
+    def mark_loaded(self, model_id):
+        entry = self.models.get(model_id)
+        if entry is not None and not entry["loaded"]:
+            entry["loaded"] = True
+            self.save()
+
+    def add_favorite(self, model_id):
+        if model_id not in self.favorites:
+            self.favorites.append(model_id)
+            self.save()
+
+    def remove_favorite(self, model_id):
+        if model_id in self.favorites:
+            self.favorites.remove(model_id)
+            self.save()
+            return True
+        return False
+
+    def describe(self, model_id):
+        """One short line for the model list: favorite/loaded markers, id and context length."""
+        entry = self.models.get(model_id) or {}
+        marks = ("*" if model_id in self.favorites else " ") + ("L" if entry.get("loaded") else " ")
+        ctx = entry.get("ctx")
+        return f"{marks} {model_id} ({ctx})" if ctx else f"{marks} {model_id}"
@@ -0,0 +1,230 @@
+# Multi-backend request routing for T-Deck LLM Chat Application
+
+import time
+import asyncio
+import logger
+import connection
+from json_stream import JsonStream
+
+# A probe reads only ids and load state from the model listing
+PROBE_FIELDS = (("data", "*", "id"), ("data", "*", "state"))
+
+# kind -> (role, path) of the cheap GET that checks a backend; kinds not listed are never probed
+PROBES = {
+    "llm": ("lmstudio", "/api/v0/models"),
+    "tts": ("tts", "/v1/models"),
+}
+
+
+class Backend:
+    """One server and what the router has learned about it."""
+
+    def __init__(self, kind, index, url, endpoints):
+        self.kind = kind  # "llm", "tts" or "gateway"
+        self.index = index  # Position in config.json among servers of its kind
+        self.url = url
+        self.endpoints = endpoints  # role -> name of its ConnectionManager endpoint
+        self.latency = None  # Moving average of seconds to first byte, None until measured
+        self.healthy = True
+        self.failures = 0  # Consecutive failed requests or probes
+        self.retry_at = 0.0  # time.monotonic() after which an unhealthy backend is tried again
+        self.models = None  # Ids it serves, and the ones it has loaded; None until an LLM probe says
+        self.loaded = None
+
+    def describe(self):
+        state = "up" if self.healthy else f"down ({self.failures} failures)"
+        latency = "-" if self.latency is None else f"{self.latency * 1000:.0f}ms"
+        return f"{self.kind}{self.index} {self.url} {state}, {latency}"
+
+
+class Router:
+    """Sends each request to the best server for its role and fails over to the next one.
+
+    Roles are the names requests used before there was more than one server:
+    "llm", "lmstudio", "tts", "tts_prefetch" and "gateway". Each backend
+    registers one ConnectionManager endpoint per role ("llm@1", ...), so every
+    server keeps its own keep-alive sessions. Backends are ranked by health,
+    by whether they serve (and have loaded) the model, then by a moving average
+    of time to first byte from both requests and probes. A device stays on the
+    backend it used last while that one is within slack of the fastest, so the
+    server's prompt cache keeps matching; when it has to choose afresh it picks
+    at random among the near-fastest, which spreads a fleet of devices across
+    the servers.
+    """
+
+    def __init__(self, connections, slack=1.5, probe_timeout=3, backoff=5, max_backoff=120):
+        self.connections = connections
+        self.backends = []
+        self.endpoints = {}  # role -> backends serving it, in config order
+        self.slack = slack
+        self.probe_timeout = probe_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._current = {}  # kind -> backend used last
+        self._last = {}  # role -> backend that answered the last request
+
+    def add(self, kind, url, api_key, roles, extra_headers=None):
+        """Register a server; roles maps each role it serves to the base URL for that role."""
+        index = sum(1 for backend in self.backends if backend.kind == kind)
+        endpoints = {role: f"{role}@{index}" for role in roles}
+        backend = Backend(kind, index, url, endpoints)
+        for role, base_url in roles.items():
+            self.connections.add_endpoint(endpoints[role], base_url, api_key, extra_headers)
+            self.endpoints.setdefault(role, []).append(backend)
+        self.backends.append(backend)
+        return backend
+
+    def _tier(self, backend, model, now):
+        """Sort key ahead of latency: usable first, then serving the model, then having it loaded."""
+        down = not backend.healthy and now < backend.retry_at
+        missing = model is not None and backend.models is not None and model not in backend.models
+        cold = model is not None and backend.loaded is not None and model not in backend.loaded
+        return (down, missing, cold)
+
+    def ranked(self, role, model=None):
+        """Backends for role in the order requests try them."""
+        now = time.monotonic()
+        backends = sorted(self.endpoints.get(role, ()),
+                          key=lambda b: (self._tier(b, model, now), b.latency or 0, b.index))
+        if len(backends) > 1:
+            best = backends[0]
+            tier = self._tier(best, model, now)
+            limit = (best.latency or 0) * self.slack + 0.05
+            near = [b for b in backends if self._tier(b, model, now) == tier and (b.latency or 0) <= limit]
+            current = self._current.get(best.kind)
+            if current in near:
+                choice = current
+            else:
+                import random  # Only needed once there is a choice to make, so kept off the boot path
+                choice = random.choice(near)
+            backends.remove(choice)
+            backends.insert(0, choice)
+        return backends
+
+    def request(self, role, method, path, model=None, **kwargs):
+        """Send a request for role, trying backends in ranked order. Returns the response, headers already read.
+
+        Backends that fail to connect or answer with a server error are marked
+        down and the next is tried; the last one's error or response is what the
+        caller gets.
+        """
+        backends = self.ranked(role, model)
+        if not backends:
+            raise KeyError(role)
+        for n, backend in enumerate(backends):
+            name = backend.endpoints[role]
+            last = n + 1 == len(backends)
+            try:
+                response = self.connections.request(name, method, path, **kwargs)
+            except (OSError, RuntimeError, connection.OutOfRetries) as e:
+                self.mark_down(backend, e)
+                if last:
+                    raise
+                continue
+            if response.status_code >= 500 and not last:
+                self.mark_down(backend, f"HTTP {response.status_code}")
+                self.connections.abort(response)  # Unread error page would be left on the pooled socket
+                response.close()
+                continue
+            self._observe(backend, self.connections.endpoints[name].timings["first_byte"])
+            self._current[backend.kind] = backend
+            self._last[role] = backend
+            return response
+
+    def timings(self, role):
+        """Timings of the last request for role, from the endpoint that answered it."""
+        return self.connections.endpoints[self._last[role].endpoints[role]].timings
+
+    def finished(self, role):
+        self.connections.finished(self._last[role].endpoints[role])
+
+    def failed(self, role, error):
+        """A response for role broke after it was returned, e.g. mid-stream; the next request avoids that backend."""
+        backend = self._last.get(role)
+        if backend is not None:
+            self.mark_down(backend, error)
+
+    def note_loaded(self, role, model):
+        """The backend that answered the last request for role now has model loaded."""
+        backend = self._last.get(role)
+        if backend is None:
+            return
+        for ids in (backend.models, backend.loaded):
+            if ids is not None:
+                ids.add(model)
+
+    def mark_down(self, backend, reason):
+        backend.healthy = False
+        backend.failures += 1
+        delay = min(self.backoff * 2 ** (backend.failures - 1), self.max_backoff)
+        backend.retry_at = time.monotonic() + delay
+        if self._current.get(backend.kind) is backend:
+            del self._current[backend.kind]
+        logger.warning("%s%d (%s) down: %s; retrying in %ds", backend.kind, backend.index, backend.url, reason, delay)
+
+    def _observe(self, backend, seconds):
+        backend.latency = seconds if backend.latency is None else (backend.latency * 3 + seconds) / 4
+        if not backend.healthy:
+            logger.info("%s%d (%s) is back", backend.kind, backend.index, backend.url)
+        backend.healthy = True
+        backend.failures = 0
+
+    def probe(self, backend):
+        """Check one backend with a small GET and note its latency; LLM servers also report their models."""
+        role, path = PROBES[backend.kind]
+        name = backend.endpoints[role]
+        try:
+            response = self.connections.request(name, "GET", path, timeout=self.probe_timeout, retries=0)
+            drained = False
+            try:
+                if response.status_code >= 500:
+                    self.mark_down(backend, f"HTTP {response.status_code}")
+                    return
+                self._observe(backend, self.connections.endpoints[name].timings["first_byte"])
+                if backend.kind == "llm" and response.status_code == 200:
+                    models = set()
+                    loaded = set()
+                    state = {}
+                    for (_, index, field), value in JsonStream(response._readinto, PROBE_FIELDS).values():
+                        state.setdefault(index, {})[field] = value
+                    for entry in state.values():
+                        if "id" in entry:
+                            models.add(entry["id"])
+                            if entry.get("state") == "loaded":
+                                loaded.add(entry["id"])
+                    backend.models = models
+                    backend.loaded = loaded
+                    drained = True  # The parser reads to the end of the body
+            finally:
+                if not drained:
+                    # Bodies not worth parsing would otherwise be left on the shared session socket
+                    self.connections.abort(response)
+                response.close()
+        except (OSError, RuntimeError, ValueError, connection.OutOfRetries) as e:
+            self.mark_down(backend, e)
+
+    def needs_probes(self):
+        """True when some kind has more than one server, so there is a choice to make."""
+        kinds = [backend.kind for backend in self.backends if backend.kind in PROBES]
+        return any(kinds.count(kind) > 1 for kind in kinds)
+
+    def probe_all(self):
+        for backend in self.backends:
+            if backend.kind in PROBES:
+                self.probe(backend)
+
+    async def keep_probing(self, is_idle, interval=30):
+        """Background task: probe every server each interval, but only while is_idle() says the network is free."""
+        if not self.needs_probes():
+            return  # One server per kind: nothing to choose between
+        while True:
+            await asyncio.sleep(interval)
+            for backend in self.backends:
+                if not is_idle():
+                    break
+                if backend.kind in PROBES:
+                    self.probe(backend)
+                    await asyncio.sleep(0)
+
+    def describe(self):
+        return [backend.describe() for backend in self.backends]
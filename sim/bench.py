@@ -0,0 +1,85 @@
+# Benchmark scenarios for the T-Deck LLM Chat Application simulator
+#
+# Runs sim/run.py once per scenario, each in a fresh interpreter since main.py
+# keeps its state in module globals, and prints one row per scenario.
+#
+#   python sim/bench.py                   # all scenarios
+#   python sim/bench.py stream slow-link  # just these
+#   python sim/bench.py --json bench.json
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = {
+    "stream": [],
+    "no-stream": ["--no-stream"],
+    "slow-link": ["--bandwidth", "20000"],
+    "slow-tts": ["--synth-delay", "1.5"],
+    "wav": ["--tts-format", "wav"],
+    "text-only": ["--no-tts"],
+    "gateway": ["--gateway"],
+    "failover": ["--dead-server"],
+}
+
+COLUMNS = (
+    ("boot s", "boot_interactive_seconds"),
+    ("key p95 ms", lambda r: r["key_to_render_ms"]["p95"]),
+    ("ttft s", "ttft_mean_s"),
+    ("ttfa s", "ttfa_mean_s"),
+    ("requests", "request_total"),
+    ("conns", "connections"),
+    ("KB rx", lambda r: r["bytes_from_server"] // 1024),
+    ("heap KB", "peak_heap_kb"),
+    ("wall s", "wall_seconds"),
+)
+
+
+def run_scenario(name, extra_args):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        out = f.name
+    try:
+        result = subprocess.run([sys.executable, os.path.join(SIM_DIR, "run.py"), "--json", out] + extra_args,
+                                capture_output=True, text=True)
+        if result.returncode != 0 or not os.path.getsize(out):
+            sys.stderr.write(f"{name} failed:\n{result.stdout}{result.stderr}\n")
+            return None
+        with open(out) as f:
+            return json.load(f)
+    finally:
+        os.remove(out)
+
+
+def cell(report, column):
+    value = column(report) if callable(column) else report[column]
+    return "-" if value is None else str(value)
+
+
+def main(argv):
+    json_out = None
+    if "--json" in argv:
+        i = argv.index("--json")
+        json_out = argv[i + 1]
+        argv = argv[:i] + argv[i + 2:]
+    names = argv or list(SCENARIOS)
+    results = {}
+    print(f"{'scenario':12}" + "".join(f"{title:>12}" for title, _ in COLUMNS))
+    for name in names:
+        report = run_scenario(name, SCENARIOS[name])
+        results[name] = report
+        if report is None:
+            print(f"{name:12}{'failed':>12}")
+        else:
+            print(f"{name:12}" + "".join(f"{cell(report, column):>12}" for _, column in COLUMNS), flush=True)
+    if json_out:
+        with open(json_out, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
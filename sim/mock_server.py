@@ -0,0 +1,179 @@
+# Mock LM Studio and TTS server for the T-Deck LLM Chat Application simulator
+#
+# Serves the OpenAI-compatible routes the app calls (/v1/models,
+# /v1/chat/completions, /v1/audio/speech) plus LM Studio's /api/v0/models.
+# Chat replies replay a recorded token trace with its timings; speech replays
+# the start of speech_stream.wav, as much as the text would take to say, at a
+# chosen bandwidth after a chosen synthesis delay.
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODELS = [
+    {"id": "smollm2-ft-masteryoda-motih", "type": "llm", "arch": "llama", "state": "loaded",
+     "max_context_length": 8192, "loaded_context_length": 4096},
+    {"id": "phi-4-mini-instruct", "type": "llm", "arch": "phi3", "state": "not-loaded", "max_context_length": 131072},
+    {"id": "qwen/qwen3-4b", "type": "llm", "arch": "qwen3", "state": "not-loaded", "max_context_length": 32768},
+    {"id": "text-embedding-nomic-embed-text-v1.5", "type": "embeddings", "arch": "nomic-bert",
+     "state": "not-loaded", "max_context_length": 2048},
+]
+
+
+class MockServer:
+    """Runs the HTTP server on a background thread and counts what it was asked for."""
+
+    def __init__(self, trace, wav_path, bandwidth=250000, synth_delay=0.3, synth_per_char=0.004, speech_per_char=0.065,
+                 chunk_size=4096):
+        with open(trace) as f:
+            self.trace = json.load(f)
+        with open(wav_path, "rb") as f:
+            self.wav = f.read()
+        self.bandwidth = bandwidth  # Bytes per second for speech downloads
+        self.synth_delay = synth_delay  # Seconds before the first audio byte
+        self.synth_per_char = synth_per_char
+        self.speech_per_char = speech_per_char  # Seconds of audio per character of input
+        self.chunk_size = chunk_size
+        self.requests = {}  # "METHOD /path" -> count
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(_Handler):
+            mock = server
+
+        self.httpd = _QuietServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def count(self, key, sent=0):
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes_sent += sent
+
+    def sent(self, n):
+        with self._lock:
+            self.bytes_sent += n
+
+    def opened(self):
+        with self._lock:
+            self.connections += 1
+
+    def pcm(self):
+        """The PCM samples of the recorded WAV, without its header."""
+        data = self.wav.find(b"data")
+        return self.wav[data + 8:] if data >= 0 else self.wav
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # The app hanging up mid-response (a stopped clip) is expected, not a server fault
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, as the app's sessions expect
+    mock = None
+
+    def setup(self):
+        super().setup()
+        self.mock.opened()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _send_json(self, status, obj):
+        data = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.mock.sent(len(data))
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+        self.mock.sent(len(data))
+
+    def do_GET(self):
+        self.mock.count(f"GET {self.path}")
+        if self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": m["id"], "object": "model"} for m in MODELS]})
+        elif self.path == "/api/v0/models":
+            self._send_json(200, {"object": "list", "data": MODELS})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        self.mock.count(f"POST {self.path}")
+        body = self._body()
+        if self.path == "/v1/models":
+            self._send_json(200, {"status": "loaded", "model": body.get("model")})
+        elif self.path == "/v1/chat/completions":
+            self._chat(body)
+        elif self.path == "/v1/audio/speech":
+            self._speech(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _chat(self, body):
+        trace = self.mock.trace
+        model = body.get("model")
+        if not body.get("stream"):
+            time.sleep(trace["ttft"] + sum(delay for delay, _ in trace["tokens"]))
+            content = "".join(token for _, token in trace["tokens"])
+            self._send_json(200, {
+                "id": "chatcmpl-sim", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 40, "completion_tokens": len(trace["tokens"]),
+                          "total_tokens": 40 + len(trace["tokens"])},
+            })
+            return
+        self._start_chunked("text/event-stream")
+        time.sleep(trace["ttft"])
+        for delay, token in trace["tokens"]:
+            time.sleep(delay)
+            event = {"id": "chatcmpl-sim", "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            self._chunk(b"data: " + json.dumps(event).encode() + b"\n\n")
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _speech(self, body):
+        response_format = body.get("response_format", "wav")
+        pcm = self.mock.pcm()
+        header = self.mock.wav[:len(self.mock.wav) - len(pcm)]
+        # 24 kHz 16-bit mono, like the recording; its header carries the streaming placeholder length
+        length = min(len(pcm), int(self.mock.speech_per_char * len(body.get("input", "")) * 48000) & ~1)
+        if response_format == "wav":
+            audio = header + pcm[:length]
+        elif response_format == "pcm":
+            audio = pcm[:length]
+        else:
+            self._send_json(400, {"error": f"unsupported response_format {response_format}"})
+            return
+        self._start_chunked("audio/wav" if response_format == "wav" else "audio/pcm")
+        time.sleep(self.mock.synth_delay + self.mock.synth_per_char * len(body.get("input", "")))
+        step = self.mock.chunk_size
+        for i in range(0, len(audio), step):
+            chunk = audio[i:i + step]
+            time.sleep(len(chunk) / self.mock.bandwidth)
+            self._chunk(chunk)
+        self._chunk(b"")
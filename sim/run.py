@@ -0,0 +1,196 @@
+# Host-side simulator for T-Deck LLM Chat Application
+#
+# Runs the unmodified main.py and config.py on Linux against stand-in hardware
+# modules (sim/stubs), a scripted keyboard and a local mock LM Studio/TTS
+# server, then reports latency, request and memory figures.
+#
+#   python sim/run.py                       # default script and token trace
+#   python sim/run.py --no-stream --bandwidth 20000 --json result.json
+#   python sim/run.py --gateway              # through gateway/gateway.py
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SIM_DIR)
+
+sys.path[:0] = [os.path.join(SIM_DIR, "stubs"), SIM_DIR, REPO_DIR]
+
+import sim_probe
+from mock_server import MockServer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run main.py on the host against a mock server and report timings.")
+    parser.add_argument("--script", default=os.path.join(SIM_DIR, "script.txt"), help="lines to type, one per line")
+    parser.add_argument("--trace", default=os.path.join(SIM_DIR, "tokens.json"), help="recorded token timings")
+    parser.add_argument("--wav", default=os.path.join(REPO_DIR, "speech_stream.wav"), help="audio replayed by the TTS route")
+    parser.add_argument("--bandwidth", type=int, default=250000, help="TTS download speed in bytes per second")
+    parser.add_argument("--synth-delay", type=float, default=0.3, help="seconds before the first TTS byte")
+    parser.add_argument("--no-stream", action="store_true", help="set chat_stream to false")
+    parser.add_argument("--no-tts", action="store_true", help="leave tts_base_url unset")
+    parser.add_argument("--tts-format", default=None, help="override tts_format (auto, wav, pcm, mp3)")
+    parser.add_argument("--gateway", action="store_true", help="run gateway/gateway.py in front of the mock server")
+    parser.add_argument("--dead-server", action="store_true",
+                        help="list an unreachable LLM and TTS server ahead of the mock server, to exercise failover")
+    parser.add_argument("--key-interval", type=float, default=0.08, help="seconds between typed keys")
+    parser.add_argument("--timeout", type=float, default=300, help="give up after this many seconds")
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def start_gateway(settings):
+    """Run the companion gateway on a background thread, configured like the device."""
+    sys.path.insert(0, os.path.join(REPO_DIR, "gateway"))
+    from gateway import Gateway
+    return Gateway(dict(settings), host="127.0.0.1", port=0).start()
+
+
+def prepare_workdir(server, args):
+    """A scratch CIRCUITPY: config.json pointed at the mock server, prompt.txt, and an SD card directory.
+
+    Returns the directory and, with --gateway, the gateway the config points at instead.
+    """
+    workdir = tempfile.mkdtemp(prefix="tdeck-sim-")
+    os.mkdir(os.path.join(workdir, "sd"))
+    with open(os.path.join(REPO_DIR, "config.json")) as f:
+        settings = json.load(f)
+    settings.update({
+        "lm_studio_base_url": server.base_url + "/v1",
+        "tts_base_url": None if args.no_tts else server.base_url,
+        "sd_card_path": os.path.join(workdir, "sd"),
+        "logging_enabled": False,
+        "log_to_sd": False,
+        "tts_prewarm": [],
+    })
+    if args.no_stream:
+        settings["chat_stream"] = False
+    if args.tts_format:
+        settings["tts_format"] = args.tts_format
+    if args.dead_server:
+        dead = "http://127.0.0.1:9"  # Discard port: nothing listens, so connects are refused
+        settings["llm_endpoints"] = [{"url": dead + "/v1"}, {"url": settings["lm_studio_base_url"]}]
+        if settings["tts_base_url"]:
+            settings["tts_endpoints"] = [{"url": dead}, {"url": settings["tts_base_url"]}]
+    gateway = None
+    if args.gateway:
+        gateway = start_gateway(settings)
+        settings["gateway_url"] = gateway.base_url
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump(settings, f)
+    shutil.copy(os.path.join(REPO_DIR, "prompt.txt"), workdir)
+    return workdir, gateway
+
+
+def run_main(workdir):
+    """Execute main.py as the device would, until the scripted keyboard finishes."""
+    app = types.ModuleType("main")
+    app.__file__ = os.path.join(REPO_DIR, "main.py")
+    sys.modules["main"] = app
+    with open(app.__file__) as f:
+        code = compile(f.read(), app.__file__, "exec")
+    os.chdir(workdir)
+    try:
+        exec(code, app.__dict__)
+    except sim_probe.SimulationDone:
+        pass
+    return app
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def build_report(server, recorder, keyboard, boot, peak_heap, wall):
+    turns = [t for t in recorder.turns if not t["line"].startswith("/")]
+    ttft = [t["first_token"] for t in turns if t["first_token"] is not None]
+    ttfa = [t["first_audio"] for t in turns if t["first_audio"] is not None]
+    keys = recorder.key_latencies
+    return {
+        "wall_seconds": round(wall, 3),
+        "timed_out": keyboard.timed_out,
+        "boot_interactive_seconds": round(boot.interactive_at - boot.started, 3) if boot.interactive_at else None,
+        "boot_stages": {name: round(seconds, 3) for name, seconds in boot.stages},
+        "keys": len(keys),
+        "key_to_render_ms": {
+            "p50": round(1000 * percentile(keys, 0.5), 1) if keys else None,
+            "p95": round(1000 * percentile(keys, 0.95), 1) if keys else None,
+            "max": round(1000 * max(keys), 1) if keys else None,
+        },
+        "turns": [{
+            "line": t["line"],
+            "ttft_s": None if t["first_token"] is None else round(t["first_token"], 3),
+            "ttfa_s": None if t["first_audio"] is None else round(t["first_audio"], 3),
+            "done_s": None if t["done"] is None else round(t["done"], 3),
+        } for t in recorder.turns],
+        "ttft_mean_s": round(statistics.mean(ttft), 3) if ttft else None,
+        "ttfa_mean_s": round(statistics.mean(ttfa), 3) if ttfa else None,
+        "audio_seconds": round(recorder.audio_seconds, 2),
+        "requests": dict(sorted(server.requests.items())),
+        "request_total": sum(server.requests.values()),
+        "connections": server.connections,
+        "bytes_from_server": server.bytes_sent,
+        "peak_heap_kb": round(peak_heap / 1024, 1),
+    }
+
+
+def print_report(report):
+    print(f"Wall time            {report['wall_seconds']:.2f}s{'  (TIMED OUT)' if report['timed_out'] else ''}")
+    print(f"Boot to prompt       {report['boot_interactive_seconds']}s  {report['boot_stages']}")
+    keys = report["key_to_render_ms"]
+    print(f"Key to render (ms)   p50 {keys['p50']}  p95 {keys['p95']}  max {keys['max']}  ({report['keys']} keys)")
+    for turn in report["turns"]:
+        print(f"  {turn['line'][:32]:32}  ttft {turn['ttft_s']}  ttfa {turn['ttfa_s']}  done {turn['done_s']}")
+    print(f"TTFT mean            {report['ttft_mean_s']}s")
+    print(f"First audio mean     {report['ttfa_mean_s']}s  ({report['audio_seconds']}s of audio)")
+    print(f"Requests             {report['request_total']} over {report['connections']} connections")
+    for key, count in report["requests"].items():
+        print(f"  {count:4}  {key}")
+    print(f"Bytes from server    {report['bytes_from_server']}")
+    print(f"Peak Python heap     {report['peak_heap_kb']} KB (CPython; compare runs, not with the device)")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = MockServer(args.trace, args.wav, bandwidth=args.bandwidth, synth_delay=args.synth_delay).start()
+    workdir, gateway = prepare_workdir(server, args)
+    with open(args.script) as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+
+    def is_idle():
+        app = sys.modules["main"]
+        return app.network_idle() and not app.speech.active
+
+    keyboard = sim_probe.Keyboard(lines, is_idle, key_interval=args.key_interval, timeout=args.timeout)
+    sim_probe.keyboard = keyboard
+    started = time.monotonic()
+    tracemalloc.start()
+    try:
+        app = run_main(workdir)
+    finally:
+        os.chdir(REPO_DIR)
+    peak_heap = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Requests and bytes as the device sees them: to the gateway when there is one
+    report = build_report(gateway or server, sim_probe.recorder, keyboard, app.boot, peak_heap, time.monotonic() - started)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if keyboard.timed_out else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# Measurement hooks for the T-Deck LLM Chat Application simulator
+#
+# The stand-in modules call into here whenever something the user would notice
+# happens (a key is read, a label changes, the screen refreshes, audio starts),
+# and run.py turns the timestamps into the benchmark report.
+
+import time
+
+
+class SimulationDone(Exception):
+    """Raised from the keyboard once the script has run and the app is idle again."""
+
+
+class Recorder:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.display = None  # Set by the displayio stand-in
+        self.key_latencies = []  # Seconds from a key being read to it being on screen
+        self.turns = []  # One dict per submitted line
+        self.audio_seconds = 0.0
+        self.refreshes = 0
+        self._pending_keys = []
+        self._input_dirty = False
+
+    def on_key(self, key, line):
+        now = time.monotonic()
+        self._pending_keys.append(now)
+        if key == "\n":
+            self.turns.append({"line": line, "enter": now, "first_token": None, "first_audio": None, "done": None})
+
+    def _current_turn(self):
+        return self.turns[-1] if self.turns else None
+
+    def _drawn(self):
+        if self._input_dirty:
+            now = time.monotonic()
+            self.key_latencies.extend(now - t for t in self._pending_keys)
+            self._pending_keys = []
+            self._input_dirty = False
+
+    def on_label(self, label, text):
+        if text.startswith("> "):
+            self._input_dirty = True
+        turn = self._current_turn()
+        if turn is not None and turn["first_token"] is None and not turn["line"].startswith("/"):
+            if text.startswith("YoYo:: ") and len(text) > 7:
+                turn["first_token"] = time.monotonic() - turn["enter"]
+        # With auto_refresh on, a changed label is on the panel at the next frame
+        if self.display is None or self.display.auto_refresh:
+            self._drawn()
+
+    def on_refresh(self):
+        self.refreshes += 1
+        self._drawn()
+
+    def on_audio(self, seconds):
+        self.audio_seconds += seconds
+        turn = self._current_turn()
+        if turn is not None and turn["first_audio"] is None:
+            turn["first_audio"] = time.monotonic() - turn["enter"]
+
+
+class Keyboard:
+    """Types each script line at key_interval per key, waiting for the app to go idle between lines."""
+
+    def __init__(self, lines, is_idle, key_interval=0.08, think_time=0.5, timeout=300):
+        self.lines = list(lines)
+        self.is_idle = is_idle
+        self.key_interval = key_interval
+        self.think_time = think_time
+        self.deadline = time.monotonic() + timeout
+        self.timed_out = False
+        self._line = ""
+        self._typing = ""
+        self._next_at = 0.0
+
+    def next_key(self):
+        now = time.monotonic()
+        if now > self.deadline:
+            self.timed_out = True
+            raise SimulationDone()
+        if now < self._next_at:
+            return None
+        if not self._typing:
+            if not self.is_idle():
+                self._next_at = now + 0.05
+                return None
+            turn = recorder._current_turn()
+            if turn is not None and turn["done"] is None:
+                turn["done"] = now - turn["enter"]
+            if not self.lines:
+                raise SimulationDone()
+            self._line = self.lines.pop(0)
+            self._typing = self._line + "\n"
+            self._next_at = now + self.think_time
+            return None
+        key = self._typing[0]
+        self._typing = self._typing[1:]
+        self._next_at = now + self.key_interval
+        recorder.on_key(key, self._line)
+        return key
+
+
+recorder = Recorder()
+keyboard = None  # Installed by run.py before main.py starts
+
+
+def on_label(label, text):
+    recorder.on_label(label, text)
+
+
+def on_refresh():
+    recorder.on_refresh()
+
+
+def on_audio(seconds):
+    recorder.on_audio(seconds)
@@ -0,0 +1,22 @@
+# Host stand-in for adafruit_display_text.label, for the T-Deck LLM Chat Application simulator
+
+import sim_probe
+
+
+class Label:
+    def __init__(self, font, text="", color=0xFFFFFF, x=0, y=0, **kwargs):
+        self.font = font
+        self.color = color
+        self.x = x
+        self.y = y
+        self._text = text
+        self.hidden = False
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
+        sim_probe.on_label(self, value)
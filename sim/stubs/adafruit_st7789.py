@@ -0,0 +1,7 @@
+# Host stand-in for adafruit_st7789, for the T-Deck LLM Chat Application simulator
+
+from displayio import Display
+
+
+class ST7789(Display):
+    pass
@@ -0,0 +1,9 @@
+# Host stand-in for audiocore, for the T-Deck LLM Chat Application simulator
+
+
+class RawSample:
+    def __init__(self, buffer, channel_count=1, sample_rate=8000, single_buffer=True):
+        self.buffer = buffer
+        self.channel_count = channel_count
+        self.sample_rate = sample_rate
+        self.single_buffer = single_buffer
@@ -0,0 +1,20 @@
+# Host stand-in for board, for the T-Deck LLM Chat Application simulator
+
+
+class _Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"board.{self.name}"
+
+
+def SPI():
+    return object()
+
+
+def __getattr__(name):
+    # Any pin name (IO9, IO11, ...) resolves to a placeholder
+    if name.startswith("IO") or name.isupper():
+        return _Pin(name)
+    raise AttributeError(name)
@@ -0,0 +1,32 @@
+# Host stand-in for displayio, for the T-Deck LLM Chat Application simulator
+
+import sim_probe
+
+
+def release_displays():
+    pass
+
+
+class Group(list):
+    def __init__(self, x=0, y=0, scale=1):
+        super().__init__()
+        self.x = x
+        self.y = y
+        self.scale = scale
+        self.hidden = False
+
+
+class Display:
+    """Counts refreshes; with auto_refresh on, every label change counts as drawn straight away."""
+
+    def __init__(self, *args, width=320, height=240, rotation=0, **kwargs):
+        self.width = width
+        self.height = height
+        self.rotation = rotation
+        self.root_group = None
+        self.auto_refresh = True
+        sim_probe.recorder.display = self
+
+    def refresh(self, target_frames_per_second=None, minimum_frames_per_second=0):
+        sim_probe.on_refresh()
+        return True
@@ -0,0 +1,6 @@
+# Host stand-in for fourwire, for the T-Deck LLM Chat Application simulator
+
+
+class FourWire:
+    def __init__(self, spi, command=None, chip_select=None, reset=None, baudrate=None):
+        self.spi = spi
@@ -0,0 +1,45 @@
+# Host stand-in for lilygo_tdeck, for the T-Deck LLM Chat Application simulator
+
+import time
+import sim_probe
+
+
+class Speaker:
+    """Pretends to play samples for as long as they would last on the real I2S speaker."""
+
+    def __init__(self):
+        self._until = 0.0
+        self._looping_since = None
+
+    @property
+    def playing(self):
+        return self._looping_since is not None or time.monotonic() < self._until
+
+    def play(self, sample, loop=False):
+        self.stop()
+        if loop:
+            # A looping sample plays until stopped; its time is counted then
+            self._looping_since = time.monotonic()
+            sim_probe.on_audio(0.0)
+            return
+        buffer = getattr(sample, "buffer", None)
+        if buffer is not None:
+            seconds = len(buffer) / sample.channel_count / sample.sample_rate
+        else:
+            seconds = 0.5  # Compressed audio: length unknown without decoding
+        self._until = time.monotonic() + seconds
+        sim_probe.on_audio(seconds)
+
+    def stop(self):
+        if self._looping_since is not None:
+            sim_probe.on_audio(time.monotonic() - self._looping_since)
+            self._looping_since = None
+        self._until = 0.0
+
+
+class TDeck:
+    def __init__(self):
+        self.speaker = Speaker()
+
+    def get_keypress(self):
+        return sim_probe.keyboard.next_key()
@@ -0,0 +1,21 @@
+# Host stand-in for socketpool, for the T-Deck LLM Chat Application simulator
+#
+# Hands out CPython sockets, so the real adafruit_requests and
+# adafruit_connection_manager (sim/requirements.txt) run unchanged on top, as
+# they do over the device's socketpool.
+
+import socket
+
+
+class SocketPool:
+    AF_INET = socket.AF_INET
+    SOCK_STREAM = socket.SOCK_STREAM
+
+    def __init__(self, radio):
+        self.radio = radio
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        return socket.getaddrinfo(host, port, family, type, proto, flags)
+
+    def socket(self, family=AF_INET, type=SOCK_STREAM, proto=0):
+        return socket.socket(family, type, proto)
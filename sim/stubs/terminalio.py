@@ -0,0 +1,18 @@
+# Host stand-in for terminalio, for the T-Deck LLM Chat Application simulator
+
+
+class _Glyph:
+    shift_x = 6  # The built-in terminal font is 6 pixels wide
+
+
+class _Font:
+    _glyph = _Glyph()
+
+    def get_glyph(self, codepoint):
+        return self._glyph
+
+    def get_bounding_box(self):
+        return 6, 12
+
+
+FONT = _Font()
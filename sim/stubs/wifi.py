@@ -0,0 +1,15 @@
+# Host stand-in for wifi, for the T-Deck LLM Chat Application simulator
+
+
+class _Radio:
+    def __init__(self):
+        self.connected = False
+        self.ipv4_address = None
+        self.ipv4_dns = "127.0.0.53"
+
+    def connect(self, ssid=None, password=None, timeout=None):
+        self.connected = True
+        self.ipv4_address = "127.0.0.1"
+
+
+radio = _Radio()
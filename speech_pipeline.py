@@ -0,0 +1,175 @@
+# Sentence-pipelined TTS for T-Deck LLM Chat Application
+
+import logger
+
+SENTENCE_ENDS = ".!?\n"
+CLAUSE_BREAKS = ",;:"
+
+
+def _speakable(text):
+    """True if text has something worth synthesizing (not just punctuation or whitespace)."""
+    for ch in text:
+        if ch.isalpha() or ch.isdigit():
+            return True
+    return False
+
+
+class SentenceSplitter:
+    """Cuts streamed reply text into sentences as soon as each one is complete."""
+
+    def __init__(self, max_chars=160):
+        self.max_chars = max_chars  # Long run-on sentences are cut at a clause break instead
+        self._pending = ""
+        self._scan = 0  # Everything before this index has already been checked for a boundary
+
+    def feed(self, text):
+        """Add text and return the list of sentences it completed."""
+        self._pending += text
+        sentences = []
+        start = 0
+        pending = self._pending
+        i = max(self._scan, 0)
+        while i < len(pending) - 1:
+            # A terminator only counts once we can see the whitespace after it ("3.14", "...")
+            if pending[i] in SENTENCE_ENDS and pending[i + 1].isspace():
+                self._emit(sentences, pending[start:i + 1])
+                start = i + 1
+            elif i - start >= self.max_chars:
+                cut = start + self._clause_cut(pending[start:i + 1])
+                self._emit(sentences, pending[start:cut])
+                start = cut
+            i += 1
+        if start:
+            self._pending = pending[start:]
+        self._scan = i - start
+        return sentences
+
+    def flush(self):
+        """Return whatever text is left once the reply is complete."""
+        sentences = []
+        self._emit(sentences, self._pending)
+        self._pending = ""
+        self._scan = 0
+        return sentences
+
+    def _clause_cut(self, text):
+        for breaks in (CLAUSE_BREAKS, " "):
+            for j in range(len(text) - 1, 0, -1):
+                if text[j] in breaks:
+                    return j + 1
+        return len(text)
+
+    def _emit(self, sentences, text):
+        text = text.strip()
+        if _speakable(text):
+            sentences.append(text)
+
+
+class SpeechPipeline:
+    """Synthesizes and plays a reply one sentence at a time.
+
+    Sentence N plays while the request for sentence N+1 is already in flight, so the
+    TTS server synthesizes the next segment during playback instead of after it.
+    """
+
+    def __init__(self, player, open_stream, max_chars=160, discard_stream=None):
+        self.player = player
+        self.open_stream = open_stream  # (text, slot) -> streaming TTS response, or None on failure
+        # stream -> None; closes a response stop() abandons without waiting for the rest of its body
+        self.discard_stream = discard_stream
+        self.splitter = SentenceSplitter(max_chars)
+        self._queue = []  # Sentences waiting for a TTS request
+        self._current = None  # Response being played
+        self._next = None  # Response prefetched for the following sentence
+        # Which of two TTS sessions each response came from; a session that starts a new
+        # request closes its previous response, so the prefetch must use the other one
+        self._current_slot = 1
+        self._next_slot = 0
+
+    def add(self, text):
+        """Feed reply text as it streams in; complete sentences are queued for speech."""
+        self._queue.extend(self.splitter.feed(text))
+
+    def finish(self):
+        """Queue the tail of the reply once generation is done."""
+        self._queue.extend(self.splitter.flush())
+
+    def add_stream(self, stream):
+        """Queue audio that is already on its way (a gateway turn) to play after anything queued before it."""
+        self._queue.append(stream)
+
+    @property
+    def active(self):
+        """True while any sentence is queued, synthesizing or playing."""
+        return (self.player is not None and self.player.active) or self._next is not None or bool(self._queue)
+
+    def _open_next(self):
+        while self._queue and self._next is None:
+            sentence = self._queue.pop(0)
+            if not isinstance(sentence, str):
+                self._next = sentence  # An open stream from add_stream()
+                continue
+            logger.debug("TTS segment: %s", sentence[:40])
+            self._next_slot = self._current_slot ^ 1 if self._current is not None else 0
+            self._next = self.open_stream(sentence, self._next_slot)
+
+    def pump(self):
+        """Advance synthesis and playback without waiting. Returns True while speech is pending."""
+        if self.player is None:
+            self._queue = []
+            return False
+        complete = True
+        try:
+            playing = self.player.pump()
+        except Exception as e:
+            # A dropped TTS socket loses this segment, not the rest of the reply
+            logger.error("Audio playback error: %s", e)
+            self.player.stop()
+            playing = False
+            complete = False
+        if not playing:
+            self._close_current(complete)
+            self._open_next()
+            if self._next is not None:
+                self._current, self._next = self._next, None
+                self._current_slot = self._next_slot
+                try:
+                    # adafruit_requests' body reader handles chunked transfer encoding for us
+                    self.player.start(self._current._readinto, getattr(self._current, "audio_format", "wav"),
+                                      getattr(self._current, "path", None))
+                    self.player.pump()
+                except Exception as e:
+                    logger.error("Audio playback error: %s", e)
+                    self.player.stop()
+                    self._close_current()
+        # Get the following segment synthesizing while this one plays
+        self._open_next()
+        return self.active
+
+    def _close_current(self, complete=False):
+        if self._current is not None:
+            # Streams that record themselves (the TTS cache) keep the clip only if it played to the end
+            finish = getattr(self._current, "finish", None)
+            if complete and finish is not None:
+                try:
+                    finish()
+                except Exception as e:
+                    logger.warning("Could not keep finished clip: %s", e)
+            self._current.close()
+            self._current = None
+
+    def stop(self):
+        """Drop queued speech and silence the speaker, abandoning any TTS responses in flight."""
+        self._queue = []
+        self.splitter.flush()
+        if self.player is not None:
+            self.player.stop()
+        for stream in (self._current, self._next):
+            if stream is None:
+                continue
+            if self.discard_stream is not None:
+                self.discard_stream(stream)
+            else:
+                stream.close()
+        self._current = None
+        self._next = None
@@ -0,0 +1,37 @@
+# Boot stage timing for T-Deck LLM Chat Application
+
+import time
+import logger
+
+
+class BootTimer:
+    """Records how long each boot stage took.
+
+    Create it as the very first thing in main.py. Foreground stages are marked
+    back to back with mark(name). Background stages pass their own start time,
+    because they overlap with the interactive prompt.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()  # Seconds since reset when main.py began running
+        self._last = self.started
+        self.stages = []  # (name, seconds) in the order they finished
+        self.interactive_at = None  # Seconds since reset when the prompt accepted keys
+
+    def mark(self, name, since=None):
+        """Record the stage that just finished, timed from since or from the previous mark."""
+        now = time.monotonic()
+        elapsed = now - (self._last if since is None else since)
+        self.stages.append((name, elapsed))
+        self._last = now
+        logger.debug("Boot stage %s: %.3fs", name, elapsed)
+
+    def interactive(self):
+        """Note the moment the keyboard and display are live."""
+        self.interactive_at = time.monotonic()
+        logger.info("Interactive %.3fs after reset (%.3fs in main.py)",
+                    self.interactive_at, self.interactive_at - self.started)
+
+    def report(self):
+        """Log every stage timing on one line."""
+        logger.info("Boot stages: %s", ", ".join(f"{name} {elapsed:.3f}s" for name, elapsed in self.stages))
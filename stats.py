@@ -0,0 +1,101 @@
+# Per-turn latency statistics for T-Deck LLM Chat Application
+
+import gc
+import time
+
+# Display order for /stats; anything else recorded is listed after these
+ORDER = ("connect", "first_byte", "ttft", "generate", "draw", "log_write", "tts_request", "ttfa", "audio_pump",
+         "render", "gc", "tok_per_s")
+UNITS = {"tok_per_s": "tok/s"}
+
+
+class Rolling:
+    """The most recent samples of one measurement, kept in a fixed-size list used as a ring."""
+
+    def __init__(self, size):
+        self._values = [0] * size
+        self._next = 0
+        self.count = 0
+
+    def add(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self.count += 1
+
+    def summary(self):
+        """(p50, p90, max, samples) over the samples still in the ring."""
+        values = sorted(self._values[:min(self.count, len(self._values))])
+        n = len(values)
+        return values[n // 2], values[min(n - 1, n * 9 // 10)], values[-1], n
+
+
+class Stats:
+    """Rolling timings (in ms unless UNITS says otherwise) and free-memory watermarks."""
+
+    def __init__(self, size=32):
+        self.size = size
+        self.series = {}
+        self.mem_free = None
+        self.mem_low = None
+        self.largest = None  # Largest block that could be allocated at the last check, and the lowest seen
+        self.largest_low = None
+
+    def add(self, name, value):
+        series = self.series.get(name)
+        if series is None:
+            series = self.series[name] = Rolling(self.size)
+        series.add(value)
+
+    def since(self, name, start_ns):
+        """Record the milliseconds since start_ns (from time.monotonic_ns()) under name, and return them."""
+        ms = (time.monotonic_ns() - start_ns) // 1_000_000
+        self.add(name, ms)
+        return ms
+
+    def sample_memory(self):
+        """Note free heap; cheap enough to call every frame."""
+        if not hasattr(gc, "mem_free"):
+            return  # CPython (host simulator) has no mem_free
+        free = gc.mem_free()
+        self.mem_free = free
+        if self.mem_low is None or free < self.mem_low:
+            self.mem_low = free
+
+    def sample_largest_block(self, limit=65536, step=1024):
+        """Find, to within step bytes, the largest bytearray that can be allocated, up to limit.
+
+        Free memory can be plentiful while no single free block is big enough for
+        a request body, so this is the figure that predicts MemoryError. It tries
+        the allocations, so run it right after gc.collect(), and collect again after.
+        """
+        if not hasattr(gc, "mem_free"):
+            return  # CPython (host simulator) grows its heap instead
+        low, high = 0, limit + 1
+        while high - low > step:
+            size = (low + high) // 2
+            try:
+                block = bytearray(size)
+            except MemoryError:
+                high = size
+                continue
+            block = None
+            low = size
+        self.largest = low
+        if self.largest_low is None or low < self.largest_low:
+            self.largest_low = low
+
+    def lines(self):
+        """Short lines for the chat area, one per measurement."""
+        names = [name for name in ORDER if name in self.series]
+        names += sorted(name for name in self.series if name not in ORDER)
+        out = []
+        for name in names:
+            p50, p90, peak, n = self.series[name].summary()
+            out.append(f"{name} p50 {p50:.0f} p90 {p90:.0f} max {peak:.0f} {UNITS.get(name, 'ms')} ({n})")
+        if self.mem_free is not None:
+            out.append(f"mem free {self.mem_free // 1024}K, low {self.mem_low // 1024}K")
+        if self.largest is not None:
+            out.append(f"largest block {self.largest // 1024}K, low {self.largest_low // 1024}K")
+        if not out:
+            out.append("No measurements yet")
+        return out
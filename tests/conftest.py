@@ -0,0 +1,23 @@
+# Test setup for T-Deck LLM Chat Application
+#
+# The modules under test live flat in the repository root, as on the device.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ChunkedBody:
+    """Stands in for a response body: readinto hands out data a few bytes at a time, like a socket."""
+
+    def __init__(self, data, sizes):
+        self.data = data
+        self.pos = 0
+        self.sizes = sizes  # Callable returning the most bytes the next read may give
+
+    def _readinto(self, buf):
+        n = min(len(buf), self.sizes(), len(self.data) - self.pos)
+        buf[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
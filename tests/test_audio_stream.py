@@ -0,0 +1,51 @@
+# Tests for audio_stream.py
+
+import array
+import struct
+
+import pytest
+
+from conftest import ChunkedBody
+from audio_stream import choose_format, copy_samples, parse_wav_header
+
+
+def wav_header(channels=1, rate=24000, bits=16, data_len=1000, extra=b"", fmt_extra=b""):
+    fmt = struct.pack("<HHIIHH", 1, channels, rate, rate * channels * bits // 8, channels * bits // 8, bits) + fmt_extra
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt + extra
+    chunks += b"data" + struct.pack("<I", data_len)
+    return b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE" + chunks
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 64])
+def test_wav_header_read_a_few_bytes_at_a_time(chunk):
+    # An odd-sized LIST chunk is followed by a pad byte
+    extra = b"LIST" + struct.pack("<I", 5) + b"abcde" + b"\x00"
+    body = ChunkedBody(wav_header(2, 22050, 16, 4410, extra, fmt_extra=b"\x00\x00"), lambda: chunk)
+    assert parse_wav_header(body._readinto, bytearray(16)) == (2, 22050, 16, 4410)
+    assert body.pos == len(body.data)
+
+
+def test_streaming_placeholder_length_is_unknown():
+    for placeholder in (0, 0xFFFFFFFF):
+        body = ChunkedBody(wav_header(data_len=placeholder), lambda: 5)
+        assert parse_wav_header(body._readinto, bytearray(64))[3] is None
+
+
+@pytest.mark.parametrize("data", [b"RIFX" + bytes(40), wav_header()[:30], wav_header()[:12] + b"data" + bytes(4)])
+def test_bad_headers_raise(data):
+    with pytest.raises(ValueError):
+        parse_wav_header(ChunkedBody(data, lambda: 4)._readinto, bytearray(64))
+
+
+def test_copy_samples_reads_little_endian_pcm():
+    values = [0, 1, -1, 32767, -32768, 1234, -4321]
+    data = bytearray(struct.pack("<7h", *values) + b"\xff")
+    samples = array.array("h", (0 for _ in range(10)))
+    copy_samples(samples, 2, data, 14)
+    assert list(samples) == [0, 0] + values + [0]
+
+
+def test_auto_format_is_pcm_until_measured():
+    assert choose_format("auto", None, 24000) == "pcm"
+    assert choose_format("auto", 1_000_000, 24000) == "pcm"
+    assert choose_format("wav", None, 24000) == "wav"
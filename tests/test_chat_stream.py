@@ -0,0 +1,67 @@
+# Tests for chat_stream.py
+
+import json
+import random
+
+import pytest
+
+from conftest import ChunkedBody
+from chat_stream import iter_chat_deltas, iter_completion_content, iter_sse_data
+
+
+def sse(*events, newline=b"\n"):
+    lines = [b": keep-alive", b"event: message"]
+    for event in events:
+        data = event if isinstance(event, bytes) else json.dumps(event, ensure_ascii=False).encode("utf-8")
+        lines.append(b"data: " + data)
+        lines.append(b"")
+    return newline.join(lines) + newline
+
+
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n"])
+@pytest.mark.parametrize("chunk", [1, 2, 3, 7, 64, 4096])
+def test_sse_lines_are_assembled_across_reads(newline, chunk):
+    body = ChunkedBody(sse(b"one", b"{\"a\": 2}", b"[DONE]", newline=newline), lambda: chunk)
+    assert [bytes(data) for data in iter_sse_data(body, bytearray(32))] == [b"one", b"{\"a\": 2}", b"[DONE]"]
+
+
+def test_last_line_without_newline_is_kept():
+    body = ChunkedBody(b"data: first\ndata:second", lambda: 3)
+    assert [bytes(data) for data in iter_sse_data(body, bytearray(16))] == [b"first", b"second"]
+
+
+def test_overlong_line_is_dropped_and_the_stream_goes_on():
+    body = ChunkedBody(b"data: short\ndata: " + b"x" * 100 + b"\ndata: after\n", lambda: 5)
+    assert [bytes(data) for data in iter_sse_data(body, bytearray(16))] == [b"short", b"after"]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_chat_deltas_with_unicode_split_anywhere(seed):
+    rng = random.Random(seed)
+    pieces = ["Hello", " wörld", " \U0001F600", " 日本", " \"quoted\"", "\n", " back\\slash"]
+    events = [{"choices": [{"delta": {"role": "assistant"}}]}]
+    events += [{"choices": [{"delta": {"content": piece}}]} for piece in pieces]
+    events.append({"choices": [], "usage": {"completion_tokens": 7}})
+    body = ChunkedBody(sse(*events, b"[DONE]", b"data: ignored after done"), lambda: rng.randint(1, 11))
+    info = {}
+    assert "".join(iter_chat_deltas(body, info, bytearray(256))) == "".join(pieces)
+    assert info["usage"] == {"completion_tokens": 7}
+
+
+def test_malformed_event_is_skipped():
+    body = ChunkedBody(sse(b"{not json", {"choices": [{"delta": {"content": "ok"}}]}), lambda: 4)
+    assert list(iter_chat_deltas(body)) == ["ok"]
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 50])
+def test_completion_content_and_info(chunk):
+    content = "Line one\nline \"two\" é\U0001F600 \\ end"
+    completion = {
+        "id": "x", "object": "chat.completion", "model": "mé",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 9, "total_tokens": 12},
+    }
+    body = ChunkedBody(json.dumps(completion).encode("utf-8"), lambda: chunk)
+    info = {}
+    assert "".join(iter_completion_content(body, info, buffer_size=8)) == content
+    assert info == {"model": "mé", "finish_reason": "stop", "usage": completion["usage"]}
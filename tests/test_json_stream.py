@@ -0,0 +1,94 @@
+# Tests for json_stream.py
+
+import json
+import random
+
+import pytest
+
+from conftest import ChunkedBody
+from json_stream import JsonStream, _utf8_cut
+
+WORDS = ["plain", "", "quote \" inside", "back\\slash", "tab\tnew\nline", "slash /", "café", "日本語",
+         "emoji \U0001F600 and \U0001F680", "\u0000\u001f control", "  separator", "mixed é\U0001F600\"\\\n"]
+
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(9 if depth < 3 else 5)
+    if kind == 0:
+        return rng.choice(WORDS) + rng.choice(WORDS)
+    if kind == 1:
+        return rng.randint(-10 ** 12, 10 ** 12)
+    if kind == 2:
+        return rng.choice([0.5, -1.25e-5, 3.0e20, 2.718281828])
+    if kind == 3:
+        return rng.choice([True, False])
+    if kind == 4:
+        return None
+    if kind in (5, 6):
+        return {rng.choice(WORDS) + str(i): random_value(rng, depth + 1) for i in range(rng.randrange(4))}
+    return [random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+
+
+def leaves(value, path=()):
+    """(path, value) for every scalar in document order, as JsonStream.values() reports them."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from leaves(item, path + (key,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from leaves(item, path + (index,))
+    else:
+        yield path, value
+
+
+def parse(text, wanted, buffer_size, chunk_sizes):
+    body = ChunkedBody(text.encode("utf-8"), chunk_sizes)
+    return list(JsonStream(body._readinto, wanted, buffer_size).values())
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_random_documents_match_json_loads(seed):
+    rng = random.Random(seed)
+    document = {"root": random_value(rng), "tail": [1, "x"]}
+    text = json.dumps(document, ensure_ascii=rng.choice([True, False]), indent=rng.choice([None, 1]))
+    expected = list(leaves(json.loads(text)))
+    wanted = [path for path, _ in expected]
+    for buffer_size in (1, 2, 3, 5, 16, 256):
+        got = parse(text, wanted, buffer_size, lambda: rng.randint(1, 9))
+        assert got == expected, (buffer_size, text)
+
+
+def test_wildcards_pick_fields_from_every_entry():
+    text = json.dumps({"data": [{"id": "a", "state": "loaded", "x": [1, 2]}, {"id": "bé", "state": "not-loaded"}]})
+    got = parse(text, [("data", "*", "id")], 4, lambda: 3)
+    assert got == [(("data", 0, "id"), "a"), (("data", 1, "id"), "bé")]
+
+
+def test_escapes_and_surrogate_pairs_split_across_reads():
+    text = '{"s": "\\ud83d\\ude00\\u00e9\\"\\\\\\n\\t\\/"}'
+    for size in range(1, len(text) + 1):
+        assert parse(text, [("s",)], size, lambda: size) == [(("s",), "\U0001F600é\"\\\n\t/")]
+
+
+def test_long_strings_arrive_as_fragments():
+    value = "é\U0001F600 abc " * 20
+    body = ChunkedBody(json.dumps({"s": value}, ensure_ascii=False).encode("utf-8"), lambda: 7)
+    events = list(JsonStream(body._readinto, [("s",)], 8).events())
+    assert len(events) > 1
+    assert [done for _, _, done in events] == [False] * (len(events) - 1) + [True]
+    assert "".join(fragment for _, fragment, _ in events) == value
+
+
+def test_unterminated_string_raises():
+    with pytest.raises(ValueError):
+        parse('{"s": "never ends', [("s",)], 4, lambda: 4)
+
+
+@pytest.mark.parametrize("char", ["a", "é", "日", "\U0001F600"])
+def test_utf8_cut_never_splits_a_character(char):
+    data = ("x" + char).encode("utf-8")
+    for end in range(1, len(data) + 1):
+        cut = _utf8_cut(data[:end])
+        assert cut in (1, end)
+        data[:cut].decode("utf-8")
+    assert _utf8_cut(data) == len(data)
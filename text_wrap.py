@@ -0,0 +1,106 @@
+# Incremental pixel-accurate word wrap for T-Deck LLM Chat Application
+
+import terminalio
+
+_widths = {}  # Advance width in pixels for every character measured so far
+
+
+def char_width(ch, font=terminalio.FONT):
+    """Pixel advance of ch in font, looked up once per character."""
+    width = _widths.get(ch)
+    if width is None:
+        glyph = font.get_glyph(ord(ch))
+        if glyph is None:
+            glyph = font.get_glyph(ord("?"))
+        width = glyph.shift_x if glyph is not None else 6
+        _widths[ch] = width
+    return width
+
+
+class WrappedText:
+    """Word-wraps text to a pixel width as it is appended.
+
+    Finished lines are kept in `lines` and never revisited; only the open line and
+    the word being typed are re-measured, so each appended token costs work in
+    proportion to the token, not to the message.
+    """
+
+    def __init__(self, max_width, text=""):
+        self.max_width = max_width
+        self.lines = []  # Finished lines
+        self._line = ""  # Words placed on the open line, without trailing space
+        self._line_width = 0
+        self._space = False  # A space is waiting between the open line and the next word
+        self._word = ""  # Characters of the word still being received
+        self._word_width = 0
+        if text:
+            self.append(text)
+
+    def append(self, text):
+        """Wrap more text onto the end."""
+        for ch in text:
+            if ch == "\n":
+                self._place_word()
+                if self._line:
+                    self._break_line()
+                self._space = False
+            elif ch == " " or ch == "\t" or ch == "\r":
+                self._place_word()
+                self._space = bool(self._line)
+            else:
+                self._word += ch
+                self._word_width += char_width(ch)
+                if self._word_width > self.max_width:
+                    # A single word wider than the screen gets split where it overflows
+                    if self._line:
+                        self._break_line()
+                    self.lines.append(self._word[:-1])
+                    self._word = ch
+                    self._word_width = char_width(ch)
+
+    def _place_word(self):
+        if not self._word:
+            return
+        space_width = char_width(" ") if self._space and self._line else 0
+        if self._line and self._line_width + space_width + self._word_width > self.max_width:
+            self._break_line()
+            space_width = 0
+        if space_width:
+            self._line += " "
+        self._line += self._word
+        self._line_width += space_width + self._word_width
+        self._word = ""
+        self._word_width = 0
+
+    def _break_line(self):
+        self.lines.append(self._line)
+        self._line = ""
+        self._line_width = 0
+        self._space = False
+
+    def open_lines(self):
+        """The unfinished last line, split as it would wrap if the text ended now."""
+        if not self._word:
+            return [self._line] if self._line else []
+        space_width = char_width(" ") if self._space and self._line else 0
+        if not self._line:
+            return [self._word]
+        if self._line_width + space_width + self._word_width > self.max_width:
+            return [self._line, self._word]
+        return [self._line + (" " if space_width else "") + self._word]
+
+    def line_count(self):
+        return len(self.lines) + len(self.open_lines())
+
+    def window(self, first, n):
+        """Up to n wrapped lines starting at line number first, without copying the rest."""
+        lines = self.lines[first:first + n]
+        if len(lines) < n:
+            skip = max(0, first - len(self.lines))
+            lines.extend(self.open_lines()[skip:skip + n - len(lines)])
+        return lines
+
+    def all_lines(self):
+        """Every wrapped line, finished and open."""
+        return self.lines + self.open_lines()
+
@@ -0,0 +1,234 @@
+# On-SD TTS audio cache for T-Deck LLM Chat Application
+
+import os
+import json
+import asyncio
+import binascii
+import hashlib
+import logger
+
+
+class CachedClip:
+    """A cached clip file, read through the same _readinto name as adafruit_requests.Response."""
+
+    def __init__(self, path):
+        self.path = path  # Lets the player decode a cached MP3 in place
+        self._file = open(path, "rb")
+        self._readinto = self._file.readinto
+
+    def finish(self):
+        pass
+
+    def close(self):
+        self._file.close()
+
+
+class RecordingStream:
+    """Passes a TTS response through to the player while copying it to a temporary file.
+
+    finish() reads whatever the player left unread and stores the clip in the
+    cache. close() without finish() (playback stopped or failed) drops the copy.
+    """
+
+    def __init__(self, cache, key, response):
+        self._cache = cache
+        self._key = key
+        self.response = response  # Public so a cancelled turn can drop its socket
+        self._path = cache.path(key) + ".tmp"
+        self._file = open(self._path, "wb")
+        self._size = 0
+
+    def _readinto(self, buf):
+        n = self.response._readinto(buf)
+        if n:
+            self._file.write(memoryview(buf)[:n])
+            self._size += n
+        return n
+
+    def finish(self):
+        if self._file is None:
+            return
+        scratch = self._cache.scratch
+        while self._readinto(scratch):
+            pass
+        self._file.close()
+        self._file = None
+        self._cache.store(self._key, self._path, self._size)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+        self.response.close()
+
+
+class AudioCache:
+    """TTS clips on the SD card, named by a hash of the text and every setting that shapes the audio.
+
+    index.json records each clip's size and when it was last played, so hits need no
+    directory scan and the least recently used clips are evicted once the cache
+    grows past max_bytes. max_bytes=0 turns the cache off. Only phrases up to
+    max_chars long, and the pre-warmed ones, are recorded: long sentences seldom
+    repeat, and every clip kept costs card writes in the middle of playback.
+    """
+
+    def __init__(self, directory, max_bytes=4 * 1024 * 1024, scratch=None, max_chars=60):
+        self.directory = f"{directory}/tts_cache"
+        self.scratch = scratch or bytearray(512)  # Drains the unplayed tail of a clip being recorded
+        self.index_path = f"{self.directory}/index.json"
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self._pinned = set()  # Pre-warmed phrases, recorded whatever their length
+        self.entries = {}  # key -> [size in bytes, use counter when last played]
+        self.total_bytes = 0
+        self._uses = 0  # Persistent counter standing in for a clock, which is not set at boot
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Read the index, creating the cache directory on first use."""
+        if not self.max_bytes:
+            return
+        try:
+            os.mkdir(self.directory)
+        except OSError:
+            pass  # Already there (or no card, which the open below reports)
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            self.entries = data.get("clips", {})
+            self._uses = data.get("uses", 0)
+        except (OSError, ValueError) as e:
+            logger.info("Starting an empty TTS cache in %s (%s)", self.directory, e)
+        self.total_bytes = sum(entry[0] for entry in self.entries.values())
+        logger.info("TTS cache: %d clips, %d bytes", len(self.entries), self.total_bytes)
+
+    def save(self):
+        try:
+            with open(self.index_path, "w") as f:
+                json.dump({"clips": self.entries, "uses": self._uses}, f)
+            self._dirty = False
+        except OSError as e:
+            logger.warning("Could not save TTS cache index: %s", e)
+
+    def flush(self):
+        """Write the index if hits or new clips have changed it; call between turns."""
+        if self._dirty:
+            self.save()
+
+    def key(self, *settings):
+        """Hash text and synthesis settings into a short file name."""
+        material = "\x1f".join(str(s) for s in settings).encode("utf-8")
+        return binascii.hexlify(hashlib.new("sha1", material).digest()[:8]).decode()
+
+    def path(self, key):
+        return f"{self.directory}/{key}.bin"  # WAV, PCM or MP3; the format is part of the key
+
+    def open(self, key):
+        """Return a CachedClip for key, or None on a miss."""
+        entry = self.entries.get(key)
+        if entry is None:
+            if self.max_bytes:
+                self.misses += 1
+            return None
+        try:
+            clip = CachedClip(self.path(key))
+        except OSError:
+            # The card lost the file; forget it and synthesize again
+            self._forget(key)
+            self.misses += 1
+            return None
+        self._uses += 1
+        entry[1] = self._uses
+        self._dirty = True
+        self.hits += 1
+        return clip
+
+    def record(self, key, response, text):
+        """Wrap a streaming TTS response for text so the clip is cached once it has been fully read."""
+        if not self.max_bytes or (len(text) > self.max_chars and text not in self._pinned):
+            return response
+        try:
+            return RecordingStream(self, key, response)
+        except OSError as e:
+            logger.debug("Not caching TTS clip: %s", e)
+            return response
+
+    def store(self, key, tmp_path, size):
+        """Move a completed recording into place and evict old clips to stay under max_bytes.
+
+        The index is only marked dirty; flush() writes it between turns.
+        """
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return
+        try:
+            os.rename(tmp_path, self.path(key))
+        except OSError:
+            # FAT will not rename over an existing file
+            os.remove(self.path(key))
+            os.rename(tmp_path, self.path(key))
+        if key in self.entries:
+            self.total_bytes -= self.entries[key][0]
+        self._uses += 1
+        self.entries[key] = [size, self._uses]
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            oldest = min(self.entries, key=lambda k: self.entries[k][1])
+            self._forget(oldest)
+        self._dirty = True
+        logger.debug("Cached TTS clip %s (%d bytes, %d total)", key, size, self.total_bytes)
+
+    def _forget(self, key):
+        size = self.entries.pop(key)[0]
+        self.total_bytes -= size
+        self._dirty = True
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    async def prewarm(self, phrases, open_clip, is_idle, discard, interval=5):
+        """Background task: synthesize phrases that are not cached yet, one at a time while is_idle().
+
+        Each clip is read one chunk per pass of the event loop, so typing and drawing
+        carry on. A clip still downloading when a turn starts is dropped and tried
+        again later, since the turn's speech needs the TTS session. discard(stream)
+        closes a clip that was not read to the end without leaving the rest on the socket.
+        """
+        if not self.max_bytes:
+            return
+        self._pinned.update(phrases)
+        pending = list(phrases)
+        while pending:
+            while not is_idle():
+                await asyncio.sleep(interval)
+            stream = open_clip(pending[0])
+            done = True
+            unread = isinstance(stream, RecordingStream)  # Otherwise cached already, or failed
+            if unread:
+                try:
+                    while is_idle():
+                        if not stream._readinto(self.scratch):
+                            stream.finish()
+                            unread = False
+                            break
+                        await asyncio.sleep(0)
+                    else:
+                        done = False
+                except Exception as e:
+                    logger.warning("Pre-warming %r failed: %s", pending[0], e)
+            if unread:
+                discard(stream)
+            elif stream is not None:
+                stream.close()
+            if done:
+                pending.pop(0)
+            await asyncio.sleep(0)
+        self.flush()
+        logger.info("TTS cache pre-warmed: %d phrases", len(phrases))
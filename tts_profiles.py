@@ -0,0 +1,140 @@
+# TTS latency profiles and auto-tuning for T-Deck LLM Chat Application
+
+import time
+import logger
+
+# Chatterbox settings that trade time-to-first-audio against smoothness. A profile
+# only lists what it changes; everything else keeps the value tts_generate_audio
+# builds from config.json.
+PROFILES = {
+    "lowest-latency": {
+        "desired_length": 60, "max_length": 150, "halve_first_chunk": True, "use_compilation": True,
+        "max_new_tokens": 600, "max_cache_len": 1000, "cache_voice": True,
+    },
+    "balanced": {
+        "desired_length": 100, "max_length": 300, "halve_first_chunk": True, "use_compilation": True,
+        "max_new_tokens": 1000, "max_cache_len": 1500,
+    },
+    "quality": {
+        "desired_length": 200, "max_length": 450, "halve_first_chunk": False, "use_compilation": True,
+        "max_new_tokens": 1500, "max_cache_len": 2000,
+    },
+}
+AUTO = "auto"  # Starts from "balanced" and lets TtsTuner move it
+
+# Bounds for the chunk size the tuner picks
+MIN_DESIRED_LENGTH = 40
+MAX_DESIRED_LENGTH = 200
+
+
+def profile_names(overrides=None):
+    names = list(PROFILES)
+    names.extend(name for name in overrides or {} if name not in PROFILES)
+    return names + [AUTO]
+
+
+def profile_params(name, overrides=None):
+    """Settings for profile name: the built-in values with any from config.json's tts_profiles on top."""
+    params = dict(PROFILES.get(name) or PROFILES["balanced"])
+    params.update((overrides or {}).get(name) or {})
+    return params
+
+
+class TimedStream:
+    """Wraps a TTS response to time it for the tuner.
+
+    It records when the first audio byte arrived after the request, and the
+    seconds spent waiting on the socket per second of audio. on_done(first_audio,
+    realtime_factor, bytes_per_second) runs on close, but only for responses that
+    were read to the end. Any value is None when it could not be measured.
+    """
+
+    def __init__(self, response, requested_ns, bytes_per_second, on_done):
+        self.response = response
+        self._requested_ns = requested_ns
+        self._bytes_per_second = bytes_per_second  # Of decoded PCM; None for compressed audio
+        self._on_done = on_done
+        self._first_ns = None
+        self._first_waited = False
+        self._wait_ns = 0
+        self._bytes = 0
+        self._ended = False
+
+    def _readinto(self, buf):
+        started = time.monotonic_ns()
+        n = self.response._readinto(buf)
+        now = time.monotonic_ns()
+        self._wait_ns += now - started
+        if n:
+            if self._first_ns is None:
+                self._first_ns = now
+                # A prefetched clip's first bytes sat in the socket buffer; the arrival time is only known if we waited
+                self._first_waited = now - started > 1_000_000
+            self._bytes += n
+        else:
+            self._ended = True
+        return n
+
+    def close(self):
+        if self._ended and self._on_done is not None and self._bytes >= 4096:
+            first_audio = (self._first_ns - self._requested_ns) / 1e9 if self._first_waited else None
+            rtf = None
+            if self._bytes_per_second:
+                rtf = (self._wait_ns / 1e9) / (self._bytes / self._bytes_per_second)
+            rate = self._bytes * 1_000_000_000 // self._wait_ns if self._wait_ns else None
+            self._on_done(first_audio, rtf, rate)
+        self._on_done = None
+        self.response.close()
+
+
+class TtsTuner:
+    """Moves chunk size and voice caching toward a target time-to-first-audio.
+
+    Every completed TTS response reports its first-audio latency and real-time
+    factor, and its download rate for choose_format(). Those are averaged, since the GPU box is shared and single requests
+    are noisy. When audio is late, or the server only just keeps up with
+    playback, chunks get smaller and the voice conditioning is cached. When there
+    is plenty of headroom, chunks grow back so long replies have fewer seams.
+    """
+
+    def __init__(self, start_params, target_first_audio=1.0):
+        self.params = dict(start_params)
+        self.target = target_first_audio
+        self.first_audio = None  # Moving averages of the measurements, None until measured
+        self.rtf = None
+        self.throughput = None  # Bytes per second
+
+    def observe(self, first_audio, rtf, throughput=None, adjust=True):
+        if first_audio is not None:
+            self.first_audio = first_audio if self.first_audio is None else (self.first_audio * 3 + first_audio) / 4
+        if rtf is not None:
+            self.rtf = rtf if self.rtf is None else (self.rtf * 3 + rtf) / 4
+        if throughput is not None:
+            self.throughput = throughput if self.throughput is None else (self.throughput * 3 + throughput) // 4
+        logger.debug("TTS first audio %s, real-time factor %s, %s B/s", first_audio, rtf, throughput)
+        if adjust:
+            self._adjust()
+
+    def _adjust(self):
+        desired = self.params.get("desired_length", 100)
+        slow = (self.first_audio is not None and self.first_audio > self.target * 1.2) or \
+            (self.rtf is not None and self.rtf > 0.8)
+        fast = (self.first_audio is None or self.first_audio < self.target * 0.6) and \
+            (self.rtf is None or self.rtf < 0.3)
+        if slow:
+            desired = max(MIN_DESIRED_LENGTH, desired * 3 // 4)
+            self.params["halve_first_chunk"] = True
+            self.params["cache_voice"] = True
+        elif fast and self.first_audio is not None:
+            desired = min(MAX_DESIRED_LENGTH, desired * 5 // 4)
+        if desired != self.params.get("desired_length"):
+            logger.info("TTS auto-tune: desired_length %s -> %d (first audio %.2fs, target %.2fs)",
+                        self.params.get("desired_length"), desired, self.first_audio or 0, self.target)
+            self.params["desired_length"] = desired
+            self.params["max_length"] = desired * 3
+
+    def describe(self):
+        first = "-" if self.first_audio is None else f"{self.first_audio:.2f}s"
+        rtf = "-" if self.rtf is None else f"{self.rtf:.2f}"
+        rate = "-" if self.throughput is None else f"{self.throughput // 1024} KB/s"
+        return f"first audio {first} (target {self.target:.2f}s), real-time factor {rtf}, download {rate}"